@@ -0,0 +1,18 @@
+"""
+Runs once at power-up or reset, before code.py.
+
+Make the CIRCUITPY filesystem writable by CircuitPython, so samples can be logged to flash
+(see core/flash_log.py). While it is, the filesystem is read-only over USB: to edit code from a
+computer instead, hold Featherwing button A while pressing reset.
+"""
+
+import board
+import digitalio
+import storage
+
+button_A = digitalio.DigitalInOut(board.D11)
+button_A.switch_to_input(pull=digitalio.Pull.UP)
+if button_A.value:
+    # button not pressed
+    storage.remount("/", readonly=False)
+button_A.deinit()
@@ -1,4 +1,13 @@
-import main_humidity_eink
+# time each phase of the wake cycle, starting here (see core/wake_profile.py)
+from core.wake_profile import profile
+
+# most wakes only log a sample, and only every few hours is the screen updated as well
+from wake_state import state
+
+if state.display_due():
+    import main_humidity_eink
+else:
+    import sample_wake
 #import experiments.test_led
 #import experiments.adafruit_il0373_demo
 #import experiments.test_eink_display
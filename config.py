@@ -0,0 +1,98 @@
+"""
+Settings shared by the sample-only and display wake paths (see code.py).
+"""
+
+# In debug mode, add some random noise to data, generate a lot of additional data each update, update the screen more often, and other additions for testing
+DEBUG_MODE = False
+
+# Wake every SAMPLE_MINUTES to log a reading, but only update the screen every DISPLAY_MINUTES:
+# sample-only wakes never initialize the display, so they cost a small fraction of a display wake.
+# These are the starting intervals, which the battery life scheduler below adjusts over time.
+# SAMPLE_MINUTES is also the unit of time for the history: all sample intervals are multiples of it.
+SAMPLE_MINUTES = 15
+DISPLAY_MINUTES = 120
+# in debug mode, every wake updates the screen, and wakes are DEBUG_SLEEP_MINUTES apart
+DEBUG_SLEEP_MINUTES = 3
+
+# the tricolor E Ink screen must not be refreshed more often than every three minutes: a refresh
+# requested sooner is deferred (see core/refresh.py), by light sleeping if it is due within
+# LIGHT_SLEEP_MAX_SECONDS, otherwise until the next wake (except to switch view after a button press,
+# see BUTTON_PINS, which always waits, as someone is looking at the screen)
+MIN_REFRESH_SECONDS = 180
+LIGHT_SLEEP_MAX_SECONDS = 60
+
+# Battery life target (see core/energy.py): on each display wake, pick the shortest sample and display
+# intervals from these options that should still let the battery last TARGET_DAYS from a full charge
+TARGET_DAYS = 90
+SAMPLE_MINUTES_OPTIONS = (15, 30, 60, 120)  # multiples of SAMPLE_MINUTES
+DISPLAY_MINUTES_OPTIONS = (120, 240, 480, 720)
+
+# Between display wakes, sample less often while RH holds steady, and more often when it moves
+# (see WakeState.adapt_interval()): while readings stay within RH_BAND of the reading when the interval
+# last changed, the interval doubles with each sample, up to MAX_SAMPLE_MINUTES, but never past the next
+# display update, so the display interval holds, nor over half of it, so there is still a sample-only wake
+# in between (see sample_wake.py). A change of more than RH_EVENT drops it straight back to
+# SAMPLE_MINUTES and refreshes the screen right away; anything in between returns to the interval chosen
+# by the battery life scheduler.
+RH_BAND = 2
+RH_EVENT = 5
+MAX_SAMPLE_MINUTES = 240  # a multiple of SAMPLE_MINUTES
+
+# energy model estimates, to be calibrated against measurements of this board and battery
+# (the wake and refresh times are replaced with averages from the wake profile as it fills up)
+BATTERY_MAH = 2000
+SLEEP_MA = 0.5  # whole board in deep sleep
+AWAKE_MA = 25
+SAMPLE_WAKE_MS = 600  # time awake for a sample-only wake, until the wake profile has measurements
+REFRESH_MS = 20000  # extra time awake to set up the display and refresh it, likewise
+
+NUM_BOXES = 19  # days shown on the graph
+# ...or, instead of a box per day, plot the raw samples of the last two days at full resolution, as one
+# min/max column per pixel across the rest of the screen
+DENSE_GRAPH = False
+
+# the Featherwing buttons A, B and C (pins may vary by Feather; these are for the Feather M4 Express)
+# switch the screen to the graph, the big RH number and temperature views (see core/views.py).
+# A press is caught in light sleep for BUTTON_WAIT_SECONDS after each refresh (the flashing screen is
+# the cue), and at any time on boards whose pins can wake them from deep sleep (the SAMD51's can't).
+BUTTON_PINS = ("D11", "D12", "D13")
+BUTTON_WAIT_SECONDS = 20
+
+# forecast when the desiccant will be used up, from the trend of the daily mean RH (see core/trend.py):
+# the days until it reaches DESICCANT_RH are shown at the top of the graph, on a red badge once that is
+# DESICCANT_ALERT_DAYS or less. Each day's weight in the trend halves every TREND_HALF_LIFE_DAYS.
+DESICCANT_RH = 40
+DESICCANT_ALERT_DAYS = 7
+TREND_HALF_LIFE_DAYS = 7
+
+# where readings come from: "sht4x" or "aht20" (the I2C sensor fitted), or without touching I2C at all,
+# "replay" (rows of RH,temperature from SENSOR_REPLAY_FILE, one per sample) or "synthetic" (a generated
+# daily cycle; see core/sensor_sources.py)
+SENSOR = "sht4x"
+SENSOR_REPLAY_FILE = "/replay.csv"
+
+# SHT4x precision ("low", "medium" or "high"; roughly 2, 5 and 9 ms per measurement) and the number of
+# measurements to take the median of, for sample-only wakes and for display wakes. Run sensor.benchmark()
+# from the REPL to measure the time and noise of each mode on this board.
+SAMPLE_SENSOR_MODE = "low"
+SAMPLE_SENSOR_READS = 1
+DISPLAY_SENSOR_MODE = "high"
+DISPLAY_SENSOR_READS = 3
+
+# refresh the screen at least this often, even if its content has not changed, to avoid ghosting
+FORCE_REFRESH_HOURS = 24
+
+# print the per-phase wake profile (see core/wake_profile.py) over USB serial on display wakes when a
+# serial console is connected, and show a summary of the previous cycle in the corner of the screen
+PROFILE_DUMP = True
+PROFILE_ON_SCREEN = DEBUG_MODE
+
+# the static parts of the chart, drawn once and cached on flash (see screen.py)
+CHROME_BMP = "/chrome.bmp"
+# ...and the font glyphs for the numbers on screen, as a sprite sheet
+GLYPHS_BMP = "/glyphs.bmp"
+
+# append-only log of samples on flash (see core/flash_log.py), written once the staged samples cover
+# LOG_FLUSH_PERIODS sample periods (a day), however far apart they are
+LOG_DIR = "/log"
+LOG_FLUSH_PERIODS = 24 * 60 // SAMPLE_MINUTES
@@ -0,0 +1,9 @@
+"""
+The hardware-free logic of the humidity logger: sample history, sleep memory layout, flash log,
+graph layout, energy model and wake state.
+
+Nothing in this package imports board, alarm, displayio or any other device module, so it runs
+unchanged on a desktop computer (see host/), and on the device it can be precompiled to .mpy to
+save parsing and compiling it at every wake (see host/build_mpy.py). Importing the package itself
+imports nothing, so each wake path only pays for the modules it uses.
+"""
@@ -0,0 +1,51 @@
+"""
+Minimal indexed BMP files, for artwork drawn on the device and cached on flash.
+
+write_bmp() saves a 2-color bitmap as a 1-bit BMP that displayio.OnDiskBitmap can load, with a
+32-bit tag in the file header's reserved bytes saying what it was drawn from, and bmp_tag()
+reads the tag back, so a stale file can be told apart without reading the whole image.
+"""
+
+import struct
+
+FILE_HEADER_FORMAT = "<2sIII"  # "BM", file size, reserved (the tag), offset of the pixel data
+FILE_HEADER_SIZE = 14
+INFO_HEADER_FORMAT = "<IiiHHIIiiII"
+INFO_HEADER_SIZE = 40
+
+
+def write_bmp(path, bitmap, colors, tag):
+    """Write bitmap (indexed as bitmap[x, y], with values 0 and 1) to path, with the two colors
+    (0xRRGGBB) for its values, and tag."""
+    width = bitmap.width
+    height = bitmap.height
+    row_size = (width + 31) // 32 * 4  # rows are padded to 4 bytes
+    offset = FILE_HEADER_SIZE + INFO_HEADER_SIZE + 4 * len(colors)
+    row = bytearray(row_size)
+    with open(path, "wb") as f:
+        f.write(struct.pack(FILE_HEADER_FORMAT, b"BM", offset + row_size * height, tag, offset))
+        # 1 plane, 1 bit per pixel, uncompressed, ~72 dpi, a palette of len(colors)
+        info = (INFO_HEADER_SIZE, width, height, 1, 1, 0, row_size * height, 2835, 2835, len(colors), 0)
+        f.write(struct.pack(INFO_HEADER_FORMAT, *info))
+        for color in colors:
+            f.write(struct.pack("<I", color))
+        # rows are stored bottom up, 8 pixels to a byte, leftmost in the top bit
+        for y in range(height - 1, -1, -1):
+            for i in range(row_size):
+                row[i] = 0
+            for x in range(width):
+                if bitmap[x, y]:
+                    row[x >> 3] |= 0x80 >> (x & 7)
+            f.write(row)
+
+
+def bmp_tag(path):
+    """Return the tag of a BMP written by write_bmp(), or None if there is no such file."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(FILE_HEADER_SIZE)
+    except OSError:
+        return None
+    if len(header) < FILE_HEADER_SIZE or header[:2] != b"BM":
+        return None
+    return struct.unpack(FILE_HEADER_FORMAT, header)[2]
@@ -0,0 +1,37 @@
+"""
+Temperature alongside RH: both from one sensor reading, packed into a 16-bit word per sample.
+
+The high byte is RH in 0.5% steps, the low byte temperature in 0.5 C steps above -40 C (so -39.5
+to 87 C, the sensor's range), and 0 in either byte means no data. That keeps half a percent of RH
+(the raw history tier rounds it to whole percent, for the graph) and enough temperature for a
+dew point, in 2 bytes of sleep memory per sample.
+"""
+
+import math
+
+RH_STEP = 0.5
+T_MIN = -40
+T_STEP = 0.5
+
+
+def encode_climate(rh, celsius):
+    """Pack RH (%) and temperature (C), either None for no data, into a 16-bit word."""
+    rh_code = 0 if rh is None else min(255, max(1, int(rh / RH_STEP + 0.5)))
+    t_code = 0 if celsius is None else min(255, max(1, int((celsius - T_MIN) / T_STEP + 0.5)))
+    return rh_code << 8 | t_code
+
+
+def decode_climate(word):
+    """Return (RH, temperature) from a word packed by encode_climate(), with None for no data."""
+    rh_code = word >> 8
+    t_code = word & 0xFF
+    return rh_code * RH_STEP if rh_code else None, T_MIN + t_code * T_STEP if t_code else None
+
+
+def dew_point(rh, celsius):
+    """Dew point (C) from RH (%) and temperature (C), by the Magnus formula (within ~0.4 C from -45
+    to 60 C), or None if either is missing."""
+    if not rh or celsius is None:
+        return None
+    gamma = math.log(rh / 100) + 17.62 * celsius / (243.12 + celsius)
+    return 243.12 * gamma / (17.62 - gamma)
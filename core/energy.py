@@ -0,0 +1,82 @@
+"""
+Battery telemetry and a simple energy model, used to choose sample and display intervals so
+the battery lasts a target number of days.
+
+The model is: a constant deep sleep current, plus the awake current for the time each wake
+takes. Sample-only wakes and screen refreshes are costed separately, from the measured wake
+profile (see wake_profile.py) when there is one, otherwise from configured estimates.
+Remaining charge is estimated from the battery voltage with a typical LiPo discharge curve,
+which is rough, but good enough to steer the intervals.
+"""
+
+from core.wake_profile import PHASES
+
+# battery voltage is stored in one byte per sample, in 10 mV steps above 2.5 V (0 meaning no data)
+VBAT_MIN = 2.5
+VBAT_STEP = 0.01
+
+# approximate LiPo state of charge (%) vs. voltage, under the light load of this device
+SOC_CURVE = ((3.3, 0), (3.5, 5), (3.6, 10), (3.7, 30), (3.8, 50), (3.9, 65), (4.0, 80), (4.1, 90), (4.2, 100))
+
+
+def encode_vbat(volts):
+    return min(255, max(1, int((volts - VBAT_MIN) / VBAT_STEP + 0.5)))
+
+
+def decode_vbat(code):
+    if code == 0:
+        return 0
+    return VBAT_MIN + code * VBAT_STEP
+
+
+def state_of_charge(volts):
+    """Estimate battery charge left, in % (0-100), from its voltage."""
+    if volts <= SOC_CURVE[0][0]:
+        return 0
+    for (v0, p0), (v1, p1) in zip(SOC_CURVE, SOC_CURVE[1:]):
+        if volts <= v1:
+            return p0 + (p1 - p0) * (volts - v0) / (v1 - v0)
+    return 100
+
+
+class EnergyModel:
+    """Charge used per day for a given pair of sample and display intervals."""
+
+    def __init__(self, capacity_mah, sleep_ma, awake_ma, sample_wake_ms, refresh_ms):
+        self.capacity_mah = capacity_mah
+        self.sleep_ma = sleep_ma
+        self.awake_ma = awake_ma
+        self.sample_wake_ms = sample_wake_ms  # a wake that only takes a sample
+        self.refresh_ms = refresh_ms  # extra time for a wake that refreshes the screen
+
+    def calibrate(self, records):
+        """Replace the estimated wake and refresh times with averages from wake profile records."""
+        samples = [sum(times) for kind, times, _ in records if kind == 0]
+        display = PHASES.index("display")
+        refresh = PHASES.index("refresh")
+        refreshes = [times[display] + times[refresh] for kind, times, _ in records if kind == 1 and times[refresh]]
+        if samples:
+            self.sample_wake_ms = sum(samples) / len(samples)
+        if refreshes:
+            self.refresh_ms = sum(refreshes) / len(refreshes)
+
+    def mah_per_day(self, sample_minutes, display_minutes):
+        """Charge used per day, assuming every display wake refreshes the screen."""
+        awake_ms = (24 * 60 / sample_minutes) * self.sample_wake_ms + (24 * 60 / display_minutes) * self.refresh_ms
+        return 24 * self.sleep_ma + self.awake_ma * awake_ms / 3600000
+
+    def days_left(self, soc, sample_minutes, display_minutes):
+        return soc / 100 * self.capacity_mah / self.mah_per_day(sample_minutes, display_minutes)
+
+
+def choose_schedule(model, soc, days_needed, sample_options, display_options):
+    """Pick the shortest (sample_minutes, display_minutes) that should last days_needed on the remaining
+    charge, preferring frequent samples over frequent refreshes. If none will, pick the most frugal.
+    Options must be in increasing order."""
+    for sample_minutes in sample_options:
+        for display_minutes in display_options:
+            if display_minutes < sample_minutes:
+                continue
+            if model.days_left(soc, sample_minutes, display_minutes) >= days_needed:
+                return sample_minutes, display_minutes
+    return sample_options[-1], display_options[-1]
@@ -0,0 +1,181 @@
+"""
+Append-only log of samples on the CIRCUITPY flash filesystem.
+
+Samples are staged in sleep memory (the raw tier of the history already holds the last ~48
+hours) and written out in batches, about once a day, so the flash is written rarely and a
+normal wake never touches the filesystem. The log survives resets and flat batteries, and
+on a first boot the recent history can be rebuilt from its tail.
+
+The log is a directory of numbered segment files, each a 16 byte header followed by
+fixed-size records:
+
+    magic "RHLG", version, record size, sample minutes (2 bytes), first sample number (4 bytes),
+    sample periods before the first sample (4 bytes)
+
+The sample number of each record is the header's first sample number plus its position, so
+gaps (for instance samples lost while the filesystem was read-only) just start a new segment.
+Samples need not be evenly spaced: byte time_byte of each record is the number of sample
+periods since the previous sample, so the time of any record is the header's periods count
+plus the intervals up to and including it.
+Once a segment holds segment_records records a new one is started, and the oldest segments
+are deleted beyond max_segments.
+
+Only os and open() are used, so the log can be run on a desktop computer against any
+directory. On the device, the filesystem must be writable by CircuitPython (see boot.py),
+otherwise flushes fail with OSError and are retried at the next flush.
+"""
+
+import os
+import struct
+
+MAGIC = b"RHLG"
+VERSION = 2
+HEADER_FORMAT = "<4sBBHII"
+HEADER_SIZE = 16
+SEGMENT_SUFFIX = ".rhl"
+
+
+class FlashLog:
+    """Segmented append-only log of fixed-size sample records in directory root."""
+
+    def __init__(self, root, record_size, time_byte, sample_minutes, segment_records=8192, max_segments=16):
+        self.root = root
+        self.record_size = record_size
+        self.time_byte = time_byte
+        self.sample_minutes = sample_minutes
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+
+    def _path(self, number):
+        return f"{self.root}/{number:05d}{SEGMENT_SUFFIX}"
+
+    def segments(self):
+        """Return the numbers of the segments in the log, oldest first."""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        numbers = [int(name[:5]) for name in names if name.endswith(SEGMENT_SUFFIX)]
+        numbers.sort()
+        return numbers
+
+    def _read_header(self, number):
+        """Return (first sample number, periods before it, record count) for a segment, or None if
+        it is not valid."""
+        path = self._path(number)
+        try:
+            with open(path, "rb") as f:
+                header = f.read(HEADER_SIZE)
+            size = os.stat(path)[6]
+        except OSError:
+            return None
+        if len(header) < HEADER_SIZE:
+            return None
+        magic, version, record_size, sample_minutes, first, periods = struct.unpack(HEADER_FORMAT, header)
+        if magic != MAGIC or version != VERSION or record_size != self.record_size:
+            return None
+        if sample_minutes != self.sample_minutes:
+            return None
+        # a partially written last record (power lost mid-flush) is ignored
+        return first, periods, (size - HEADER_SIZE) // self.record_size
+
+    def _new_segment(self, number, first, periods):
+        try:
+            os.mkdir(self.root)
+        except OSError:
+            pass  # already exists
+        with open(self._path(number), "wb") as f:
+            f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, self.record_size, self.sample_minutes, first, periods))
+        # rotate: drop the oldest segments beyond max_segments
+        numbers = self.segments()
+        for old in numbers[: max(0, len(numbers) - self.max_segments)]:
+            os.remove(self._path(old))
+
+    def append(self, rings, total, periods, flushed):
+        """Write the samples numbered flushed+1 ... total from rings (one RingBuffer per record byte,
+        all advanced together) to the log, and return the new flushed sample number. periods is the
+        number of sample periods up to and including sample total.
+
+        Samples that have already dropped out of the rings are skipped, leaving a gap in the log.
+        """
+        pending = total - flushed
+        capacity = len(rings[0])
+        if pending > capacity:
+            print(f"flash log: {pending - capacity} samples were lost before they could be written")
+            pending = capacity
+        if pending <= 0:
+            return total
+        first = total - pending + 1
+        numbers = self.segments()
+        info = self._read_header(numbers[-1]) if numbers else None
+        if info is None or info[0] + info[2] != first or info[2] >= self.segment_records:
+            number = numbers[-1] + 1 if numbers else 0
+            for view in rings[self.time_byte].recent(pending):
+                for interval in view:
+                    periods -= interval
+            self._new_segment(number, first, periods)
+        else:
+            number = numbers[-1]
+            # drop any partially written record before appending
+            if (os.stat(self._path(number))[6] - HEADER_SIZE) % self.record_size:
+                self._truncate(number, info[2])
+        records = bytearray(pending * self.record_size)
+        for j, ring in enumerate(rings):
+            i = j
+            for view in ring.recent(pending):
+                for value in view:
+                    records[i] = value
+                    i += self.record_size
+        with open(self._path(number), "ab") as f:
+            f.write(records)
+        return total
+
+    def _truncate(self, number, count):
+        path = self._path(number)
+        with open(path, "rb") as f:
+            data = f.read(HEADER_SIZE + count * self.record_size)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _periods_before(self, number, periods, skip):
+        """Sample periods before record skip of a segment, given the periods before its first record."""
+        with open(self._path(number), "rb") as f:
+            f.seek(HEADER_SIZE)
+            while skip > 0:
+                # read in chunks, as segments can be larger than the free RAM
+                chunk = f.read(min(skip, 256) * self.record_size)
+                if not chunk:
+                    break
+                for i in range(self.time_byte, len(chunk), self.record_size):
+                    periods += chunk[i]
+                skip -= len(chunk) // self.record_size
+        return periods
+
+    def tail(self, n):
+        """Return (first sample number, periods before it, records) for up to the last n contiguous
+        records in the log, or (0, 0, empty bytearray) if the log is empty."""
+        numbers = self.segments()
+        chunks = []
+        first = None
+        periods = 0
+        have = 0
+        for number in reversed(numbers):
+            info = self._read_header(number)
+            if info is None or info[2] == 0:
+                continue
+            seg_first, seg_periods, count = info
+            if first is not None and seg_first + count != first:
+                break  # gap in the log: only return the contiguous tail
+            take = min(count, n - have)
+            with open(self._path(number), "rb") as f:
+                f.seek(HEADER_SIZE + (count - take) * self.record_size)
+                chunks.append(f.read(take * self.record_size))
+            first = seg_first + count - take
+            periods = self._periods_before(number, seg_periods, count - take)
+            have += take
+            if have >= n:
+                break
+        records = bytearray()
+        for chunk in reversed(chunks):
+            records.extend(chunk)
+        return (first or 0), periods, records
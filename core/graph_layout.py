@@ -0,0 +1,162 @@
+"""
+Graph layout constants, and the pixel math for placing data on the graph.
+
+No display imports here, so the display wake path can work out what the screen should look
+like (and whether it has changed at all) before deciding to initialize the display.
+"""
+
+from config import NUM_BOXES, DENSE_GRAPH, SAMPLE_MINUTES
+
+# display size, in rotated (landscape) orientation
+DISPLAY_WIDTH = 296
+DISPLAY_HEIGHT = 128
+
+# chart layout constants
+graph_y0 = 110
+graph_x0 = 54
+data_x0 = 4
+box_halfwidth = 2
+highlight_marker_size = 4
+px_per_sample = 10
+graph_width = 140
+graph_height = 100
+rh_max = 60
+py_per_rh = graph_height / rh_max
+yticks = rh_max // 10
+tick_halfwidth = 3
+py_tick = graph_height // yticks
+px_tick = graph_width // NUM_BOXES
+
+# high density graph (see DENSE_GRAPH in config.py): the last dense_hours of raw samples, one column
+# per pixel from just right of the y axis to the edge of the screen (leaving room for the highlight
+# marker), with a tick every dense_tick_hours
+dense_x0 = graph_x0 + 1
+dense_width = DISPLAY_WIDTH - dense_x0 - highlight_marker_size - 1
+dense_hours = 48
+dense_tick_hours = 12
+
+# the static chart chrome (axes, ticks and their labels) is cached on flash, tagged with a hash of
+# the constants above (see chrome_hash()); bump this when the way it is drawn changes
+CHROME_VERSION = 2
+
+# characters in the glyph sprite sheet, which the numbers on screen are drawn from (tile 0 is blank)
+GLYPHS = " 0123456789%~d.-Cp"
+
+# position of the estimated battery days left, in the corner
+runtime_x = DISPLAY_WIDTH - 46
+runtime_y = DISPLAY_HEIGHT - 10
+
+# ...and of the desiccant forecast, in the top left corner of the graph
+forecast_x = graph_x0 + 10
+forecast_y = graph_y0 - graph_height + 6
+
+
+def chrome_hash():
+    """Hash everything the static chart chrome is drawn from, to tell when a cached copy is stale."""
+    constants = (DISPLAY_WIDTH, DISPLAY_HEIGHT, graph_x0, graph_y0, graph_width, graph_height, rh_max, yticks, py_tick)
+    dense = (dense_width, dense_hours, dense_tick_hours) if DENSE_GRAPH else ()
+    return hash_values(constants + (tick_halfwidth, DENSE_GRAPH) + dense)
+
+
+def glyphs_hash(tile_width, tile_height):
+    """Hash the glyph sprite sheet's characters and tile size, to tell when a cached copy is stale."""
+    return hash_values([ord(c) for c in GLYPHS] + [tile_width, tile_height])
+
+
+def hash_values(values):
+    h = CHROME_VERSION
+    for v in values:
+        h = (h * 31 + v) & 0xFFFFFFFF
+    return h
+
+
+def scale_and_clip(rh):
+    """Convert RH data into pixel Y position, with some clipping safety checks."""
+    d = min(rh_max, max(rh, 0))
+    dy = int(d * py_per_rh)
+    return dy
+
+
+def layout_data(history):
+    """Compute pixel positions of everything on the graph that depends on the data.
+
+    Returns (boxes, highlight, readout_y): boxes is a list of (x, y_min, y_max, y_q1, y_median, y_q3)
+    for each day with data, highlight the (x, y) of the red most-recent marker, and readout_y the y
+    position of the current RH text.
+    """
+    boxes = []
+    for b in range(NUM_BOXES):
+        # starting with oldest day, ending with the (partial) current day
+        age = NUM_BOXES - 1 - b
+        dmin, dmean, dmax = history.daily.entry(age)
+        x = graph_x0 + data_x0 + (b + 1) * px_tick
+        if dmean != 0:
+            # if bin has data
+            dmin_y = graph_y0 - scale_and_clip(dmin)
+            dmax_y = graph_y0 - scale_and_clip(dmax)
+            q1, median, q3 = history.day_quartiles(age)
+            q1_y = graph_y0 - scale_and_clip(q1)
+            median_y = graph_y0 - scale_and_clip(median)
+            q3_y = graph_y0 - scale_and_clip(q3)
+            boxes.append((x, dmin_y, dmax_y, q1_y, median_y, q3_y))
+    highlight = (x, graph_y0 - scale_and_clip(history.latest()))
+    readout_y = graph_y0 - int(history.latest() * py_per_rh)
+    readout_y = min(100, max(20, readout_y))
+    return boxes, highlight, readout_y
+
+
+def dense_layout(history):
+    """Compute pixel positions of the high density graph of raw samples (see DENSE_GRAPH in config.py).
+
+    Returns (columns, highlight, readout_y) as for layout_data(), but where columns is a bytearray of
+    (top y, bottom y) for each of the dense_width pixel columns, from the highest to the lowest RH
+    sampled in that column's stretch of time, with 0 for a column without data.
+
+    This is a single pass over the raw samples, newest first, each covering the sample periods since
+    the one before it (its weight), so they are placed by time rather than count, however unevenly
+    spaced. A column covering several samples gets their min and max, and a sample covering several
+    columns fills them all, so it takes O(samples + columns) time, and no memory per sample.
+    """
+    raw = history.raw
+    intervals = history.intervals
+    span = min(dense_hours * 60 // SAMPLE_MINUTES, raw.capacity)  # sample periods across the graph
+    columns = bytearray(2 * dense_width)
+    end = span  # periods from the left edge of the graph to the end of the sample
+    for age in range(min(history.total, raw.capacity)):
+        i = raw.index(age)
+        start = end - intervals.data[i]
+        rh = raw.data[i]
+        if rh != 0:
+            y = graph_y0 - scale_and_clip(rh)
+            # columns overlapping periods start to end, rounded outward so every sample gets one
+            first = max(0, start) * dense_width // span
+            last = (end * dense_width + span - 1) // span
+            for c in range(2 * first, 2 * last, 2):
+                if columns[c] == 0 or y < columns[c]:
+                    columns[c] = y
+                if y > columns[c + 1]:
+                    columns[c + 1] = y
+        if start <= 0:
+            break
+        end = start
+    rh = history.latest()
+    highlight = (dense_x0 + dense_width - 1, graph_y0 - scale_and_clip(rh))
+    # the readout covers the right end of the graph, so keep it clear of the latest data
+    readout_y = 24 if rh < rh_max // 2 else 80
+    return columns, highlight, readout_y
+
+
+def fingerprint(rh, boxes, highlight, readout_y, days_left, desiccant_days=None):
+    """Hash the visible content of the screen (24 bits), to tell when a refresh would not change anything.
+
+    boxes can be any sequence of rows of ints, such as (columns,) from dense_layout(). The
+    days left estimate only changes when the battery level does, so it is included, as is the
+    desiccant forecast (None when there is none)."""
+    h = 0
+    forecast = -1 if desiccant_days is None else desiccant_days
+    for v in (rh, readout_y, days_left, forecast) + highlight:
+        h = (h * 31 + v) & 0xFFFFFF
+    for box in boxes:
+        for v in box:
+            h = (h * 31 + v) & 0xFFFFFF
+    return h
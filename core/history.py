@@ -0,0 +1,217 @@
+"""
+Multi-resolution (round-robin) RH history, sized to fit in sleep memory.
+
+Recent samples are kept raw (about 48 hours by default), every day of samples is
+consolidated into a daily (min, mean, max) entry, plus its quartiles from a streaming sketch
+(see quantiles.py), and every 7 daily entries, as they age out of the daily tier, into a weekly
+(min, mean, max) one, so the weekly tier goes back from where the daily one ends. Other
+per-sample values (such as battery voltage) can be kept alongside the raw RH samples as extra
+channels.
+
+Samples need not be evenly spaced: each one is added with a weight, the number of nominal
+sample periods since the previous one, so day boundaries follow elapsed time rather than
+sample count and daily means are time-weighted. The weight of each raw sample is kept in
+the intervals ring, so the time of every sample can be reconstructed (and the history rebuilt
+from a log of them) by adding up intervals.
+
+Each tier is a fixed-size ring, so the oldest entries are simply overwritten, and each new
+sample costs O(1) no matter how much history is kept.
+
+A value of 0 means 'no data' throughout, both for raw samples and for entry means.
+"""
+
+from core.quantiles import QuantileSketch, BINS
+from core.ring_buffer import RingBuffer
+
+
+class Tier:
+    """Ring of consolidated (min, mean, max) entries, each summarizing period (weighted) inputs,
+    plus the running accumulator for the entry currently being filled."""
+
+    FIELDS = (("head", "H"), ("inputs", "H"), ("count", "H"), ("sum", "I"), ("low", "B"), ("high", "B"))
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+        self.data = bytearray(3 * capacity)  # min, mean, max for each entry
+        self.head = 0  # index of most recently completed entry
+        self.inputs = 0  # inputs folded into the entry being filled
+        self.count = 0  # ...of which had data
+        self.sum = 0
+        self.low = 0
+        self.high = 0
+
+    def add(self, low, mean, high, weight=1):
+        """Fold one input, standing for weight periods' worth, into the entry being filled. Return the
+        index of that entry if this input completed it, otherwise None."""
+        if mean != 0:
+            if self.count == 0 or low < self.low:
+                self.low = low
+            if high > self.high:
+                self.high = high
+            self.count += weight
+            self.sum += mean * weight
+        self.inputs += weight
+        if self.inputs < self.period:
+            return None
+        self.head = (self.head + 1) % self.capacity
+        i = 3 * self.head
+        self.data[i] = self.low
+        self.data[i + 1] = self.current_mean()
+        self.data[i + 2] = self.high
+        # an input that overshoots the end of the entry moves the boundary along with it
+        self.inputs = min(self.inputs - self.period, self.period - 1)
+        self.count = 0
+        self.sum = 0
+        self.low = 0
+        self.high = 0
+        return self.head
+
+    def current_mean(self):
+        if self.count == 0:
+            return 0
+        return (self.sum + self.count // 2) // self.count
+
+    def entry(self, age):
+        """Return (min, mean, max) for the entry age periods ago, where 0 is the partial entry
+        currently being filled. Entries older than the ring holds come back as (0, 0, 0)."""
+        if age == 0:
+            return self.low, self.current_mean(), self.high
+        if age > self.capacity:
+            return 0, 0, 0
+        i = 3 * ((self.head - age + 1) % self.capacity)
+        return self.data[i], self.data[i + 1], self.data[i + 2]
+
+
+class History:
+    """Raw, daily and weekly tiers of RH history, registered with a SleepStore.
+
+    The raw tier covers raw_hours of samples at the nominal sample_minutes interval, with the
+    interval of each sample and channels extra byte values per sample. Whatever sleep memory is
+    left after that (and after everything registered with the store before this) goes to whole
+    weeks of daily entries (with their quartiles), and a weekly entry for each of those weeks, so
+    the weekly tier covers as long again as the daily one, past its end.
+    """
+
+    def __init__(self, store, sample_minutes, raw_hours=48, channels=0):
+        self.store = store
+        store.add_field("raw_head", "H")
+        store.add_field("total", "I")
+        store.add_field("periods", "I")
+        store.register(Tier, "daily_")
+        store.register(Tier, "weekly_")
+        store.register(QuantileSketch, "sketch_")
+        budget = store.available() - BINS
+        raw_size = min(raw_hours * 60 // sample_minutes, budget // (4 + 2 * channels))
+        # 6 bytes per day (min, mean, max and quartiles), and 3 for the week they roll up into
+        weeks = (budget - raw_size * (2 + channels)) // (7 * 6 + 3)
+        if weeks < 1:
+            raise ValueError("not enough sleep memory for RH history")
+        self.raw = RingBuffer(raw_size)
+        self.intervals = RingBuffer(raw_size)  # weight of each raw sample; these and the channels advance with raw
+        self.channels = [RingBuffer(raw_size) for _ in range(channels)]
+        self.total = 0  # samples added since first boot
+        self.periods = 0  # nominal sample periods since first boot, up to the latest sample
+        # whole weeks, so the days rolled up from the end of the daily tier line up with weeks from first boot
+        self.daily = Tier(7 * weeks, 24 * 60 // sample_minutes)
+        self.weekly = Tier(weeks, 7)
+        self.sketch = QuantileSketch()  # of the day being filled
+        self.quartiles = bytearray(3 * self.daily.capacity)  # q1, median, q3 for each daily entry
+        self.raw_region = store.add_region(self.raw.data)
+        self.intervals_region = store.add_region(self.intervals.data)
+        self.channel_regions = [store.add_region(ring.data) for ring in self.channels]
+        self.daily_region = store.add_region(self.daily.data)
+        self.weekly_region = store.add_region(self.weekly.data)
+        self.sketch_region = store.add_region(self.sketch.bins)
+        self.quartiles_region = store.add_region(self.quartiles)
+        print(f"RH history: {raw_size} samples, {self.daily.capacity} days, then {weeks} weeks")
+
+    def add(self, rh, extra=(), weight=1):
+        """Store a new sample in every tier, with its extra channel values, and return the index it
+        was stored at in the raw tier. weight is the number of nominal sample periods it covers."""
+        i = self.raw.append(rh)
+        self.intervals.append(weight)
+        self.total += 1
+        self.periods += weight
+        self.store.mark_dirty(self.raw_region, i)
+        self.store.mark_dirty(self.intervals_region, i)
+        for ring, region, value in zip(self.channels, self.channel_regions, extra):
+            ring.append(value)
+            self.store.mark_dirty(region, i)
+        if rh != 0:
+            self.sketch.add(rh, weight)
+            self.store.mark_dirty(self.sketch_region, 0, BINS)
+        # the day about to be overwritten, if this sample completes one, to roll up into its week (a day
+        # before first boot is empty, so the week boundaries still fall every 7 days from first boot)
+        if self.daily.inputs + weight >= self.daily.period:
+            oldest = self.daily.entry(self.daily.capacity)
+        d = self.daily.add(rh, rh, rh, weight)
+        if d is not None:
+            self.store.mark_dirty(self.daily_region, 3 * d, 3 * d + 3)
+            low, _, high = self.daily.entry(1)
+            for j, q in enumerate(self.sketch.quartiles()):
+                self.quartiles[3 * d + j] = min(high, max(low, q))
+            self.store.mark_dirty(self.quartiles_region, 3 * d, 3 * d + 3)
+            self.sketch.reset()
+            self.store.mark_dirty(self.sketch_region, 0, BINS)
+            w = self.weekly.add(*oldest)
+            if w is not None:
+                self.store.mark_dirty(self.weekly_region, 3 * w, 3 * w + 3)
+        return i
+
+    def rings(self):
+        """The raw tier, intervals and channels, as one RingBuffer per byte of a sample record."""
+        return [self.raw, self.intervals] + self.channels
+
+    def rebuild(self, first, periods, records):
+        """Rebuild the history from a run of saved sample records (e.g. the tail of the flash log),
+        laid out as by rings(), where first is the sample number of the first record and periods
+        the number of sample periods before it.
+
+        Day and week boundaries are counted in sample periods from first boot, so they line up
+        with the original history."""
+        self.total = first - 1
+        self.periods = periods
+        self.daily.inputs = periods % self.daily.period
+        self.weekly.inputs = (periods // self.daily.period) % self.weekly.period
+        size = 2 + len(self.channels)
+        for i in range(0, len(records) - size + 1, size):
+            self.add(records[i], records[i + 2 : i + size], max(1, records[i + 1]))
+        self.store.mark_all_dirty()
+
+    def day_quartiles(self, age):
+        """Return (q1, median, q3) for the daily entry age days ago, where 0 is the day currently
+        being filled, and (0, 0, 0) for a day without data, as for Tier.entry()."""
+        low, _, high = self.daily.entry(age)
+        if age == 0:
+            if self.daily.count == 0:
+                return 0, 0, 0
+            return tuple(min(high, max(low, q)) for q in self.sketch.quartiles())
+        if age > self.daily.capacity:
+            return 0, 0, 0
+        i = 3 * ((self.daily.head - age + 1) % self.daily.capacity)
+        return self.quartiles[i], self.quartiles[i + 1], self.quartiles[i + 2]
+
+    def latest(self):
+        return self.raw.latest()
+
+    def save_state(self):
+        state = self.store.state
+        state["raw_head"] = self.raw.head
+        state["total"] = self.total
+        state["periods"] = self.periods
+        self.store.save_fields(self.daily, "daily_")
+        self.store.save_fields(self.weekly, "weekly_")
+        self.store.save_fields(self.sketch, "sketch_")
+
+    def load_state(self):
+        state = self.store.state
+        self.raw.head = state["raw_head"]
+        self.intervals.head = self.raw.head
+        for ring in self.channels:
+            ring.head = self.raw.head
+        self.total = state["total"]
+        self.periods = state["periods"]
+        self.store.load_fields(self.daily, "daily_")
+        self.store.load_fields(self.weekly, "weekly_")
+        self.store.load_fields(self.sketch, "sketch_")
@@ -0,0 +1,78 @@
+"""
+Streaming quartiles of a day's RH samples, in a few bytes of sleep memory.
+
+A QuantileSketch is a histogram of BINS byte counters over a range that starts centred on the
+first sample, one percent per bin. When a sample falls outside the range, neighbouring bins are
+merged in pairs (doubling their width) until it fits, so RH that stays within a band a few
+percent wide, as in a closed dry box, gets exact quartiles, and a day with a big swing still
+gets them to within a bin. Adding a sample is O(1), apart from the rare widening, and the
+counts are halved if one would overflow a byte.
+"""
+
+BINS = 16
+
+
+class QuantileSketch:
+    """Weighted histogram of integer values, for quantiles of the values added since reset()."""
+
+    # saved in the sleep store header (see SleepStore.register()), and the bins as a region (see History)
+    FIELDS = (("origin", "h"), ("width", "B"))
+
+    def __init__(self):
+        self.bins = bytearray(BINS)
+        self.origin = 0  # value at the low edge of bin 0
+        self.width = 0  # values per bin, or 0 if nothing has been added
+
+    def reset(self):
+        for i in range(BINS):
+            self.bins[i] = 0
+        self.width = 0
+
+    def add(self, value, weight=1):
+        if self.width == 0:
+            self.width = 1
+            self.origin = value - BINS // 2
+        while value < self.origin:
+            self._widen(True)
+        while value >= self.origin + BINS * self.width:
+            self._widen(False)
+        i = (value - self.origin) // self.width
+        if self.bins[i] + weight > 255:
+            for j in range(BINS):
+                self.bins[j] //= 2
+        self.bins[i] = min(255, self.bins[i] + weight)
+
+    def _widen(self, down):
+        """Merge bins in pairs, into the upper half of the bins (extending the range down) or the
+        lower half (extending it up)."""
+        half = BINS // 2
+        if down:
+            for j in range(BINS - 1, half - 1, -1):
+                k = 2 * (j - half)
+                self.bins[j] = min(255, self.bins[k] + self.bins[k + 1])
+            for j in range(half):
+                self.bins[j] = 0
+            self.origin -= BINS * self.width
+        else:
+            for j in range(half):
+                self.bins[j] = min(255, self.bins[2 * j] + self.bins[2 * j + 1])
+            for j in range(half, BINS):
+                self.bins[j] = 0
+        self.width *= 2
+
+    def quantile(self, q):
+        """Return the value below which a fraction q of the weight lies (the middle of its bin), or 0
+        if nothing has been added."""
+        total = sum(self.bins)
+        if total == 0:
+            return 0
+        target = q * total
+        count = 0
+        for i in range(BINS):
+            count += self.bins[i]
+            if count > target:
+                break
+        return self.origin + i * self.width + self.width // 2
+
+    def quartiles(self):
+        return self.quantile(0.25), self.quantile(0.5), self.quantile(0.75)
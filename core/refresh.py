@@ -0,0 +1,41 @@
+"""
+Refresh scheduling for the tri-color E Ink panel, which must not be refreshed more often than
+every few minutes.
+
+Reasons for a refresh are flags, so requests from anywhere in a wake, and any left over from an
+earlier wake, merge into a single refresh. A refresh requested too soon after the last one is
+deferred rather than waited for with the board running: a short wait is slept off in light
+sleep, and anything longer stays pending in sleep memory until the next wake.
+"""
+
+# reasons for a refresh
+EVENT = 1  # RH jumped (see RH_EVENT in config.py)
+CONTENT = 2  # what would be on screen has changed
+STALE = 4  # not refreshed in FORCE_REFRESH_HOURS, to avoid ghosting
+VIEW = 8  # a button switched to another view (see core/views.py)
+REASONS = ("event", "content", "stale", "view")
+
+
+class RefreshScheduler:
+    """Pending refresh reasons, and when the panel may next be refreshed."""
+
+    # saved in the sleep store header (see SleepStore.register())
+    FIELDS = (("pending", "B"),)
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval  # seconds
+        self.pending = 0
+
+    def request(self, reason):
+        self.pending |= reason
+
+    def wait(self, seconds_since_refresh, time_to_refresh=0):
+        """Seconds until the panel may be refreshed, given the time since the last refresh, and
+        the driver's own time_to_refresh if the display has been set up."""
+        return max(0, self.min_interval - seconds_since_refresh, time_to_refresh)
+
+    def done(self):
+        self.pending = 0
+
+    def describe(self):
+        return ", ".join(name for i, name in enumerate(REASONS) if self.pending & (1 << i))
@@ -0,0 +1,45 @@
+"""
+Fixed-capacity circular buffer of byte values, for sample histories on small-RAM boards.
+
+Storage is a single preallocated bytearray, and windows into the history are returned as
+memoryviews, so reading the buffer never copies or allocates new lists.
+"""
+
+
+class RingBuffer:
+    """Circular buffer of bytes, where head is the index of the most recently written value."""
+
+    def __init__(self, capacity):
+        self.data = bytearray(capacity)
+        self.view = memoryview(self.data)
+        self.capacity = capacity
+        self.head = 0
+
+    def __len__(self):
+        return self.capacity
+
+    def append(self, value):
+        """Overwrite the oldest value with a new one, returning the index it was stored at."""
+        self.head = (self.head + 1) % self.capacity
+        self.data[self.head] = value
+        return self.head
+
+    def latest(self):
+        return self.data[self.head]
+
+    def index(self, age):
+        """Buffer index of the value written age appends ago (0 being the most recent)."""
+        return (self.head - age) % self.capacity
+
+    def window(self, start, width):
+        """Return width values starting start values after the oldest one, as a tuple of one or
+        two memoryviews (two if the window wraps around the end of the buffer)."""
+        width = min(width, self.capacity)
+        i0 = (self.head + 1 + start) % self.capacity
+        if i0 + width <= self.capacity:
+            return (self.view[i0 : i0 + width],)
+        return (self.view[i0:], self.view[: i0 + width - self.capacity])
+
+    def recent(self, width):
+        """Return the most recent width values, oldest first, in the same form as window()."""
+        return self.window(self.capacity - min(width, self.capacity), width)
@@ -0,0 +1,82 @@
+"""
+Where RH and temperature readings come from: the base class that the I2C sensors in sensor.py
+implement, two sources that need no hardware at all, for debug runs, benchmarks and desktop
+runs (see SENSOR in config.py), and one for a sensor that could not be set up.
+
+A source's read() takes one measurement and returns (temperature in C, RH in %), raising OSError
+if there is no reading. Sources that play back a sequence (a recording, or a generated cycle)
+are told the number of each sample with seek() first, as they can't keep their place across
+deep sleep themselves.
+"""
+
+import math
+import random
+
+
+class SensorSource:
+    """Base class for sources of readings, which add a read(mode="high") method as described above.
+    mode is a precision mode name ("low", "medium" or "high"), for the sources that have any."""
+
+    MODES = ("low", "medium", "high")
+
+    def seek(self, sample):
+        pass
+
+
+class MissingSource(SensorSource):
+    """Stands in for a source that could not be set up: every read fails, with the reason."""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def read(self, mode="high"):
+        raise OSError(f"sensor not available ({self.reason})")
+
+
+class ReplaySource(SensorSource):
+    """Rows of "RH,temperature" from a CSV file, one per sample, starting over at the end. An empty
+    RH is a failed read, and a missing temperature reads as 20 C."""
+
+    def __init__(self, path):
+        self.rows = []
+        with open(path) as f:
+            for line in f:
+                fields = line.strip().split(",")
+                try:
+                    rh = float(fields[0]) if fields[0] else None
+                    celsius = float(fields[1]) if len(fields) > 1 and fields[1] else 20.0
+                except ValueError:
+                    continue  # header or blank line
+                self.rows.append((celsius, rh))
+        if not self.rows:
+            raise ValueError(f"no readings in {path}")
+        self.position = 0
+
+    def seek(self, sample):
+        self.position = sample % len(self.rows)
+
+    def read(self, mode="high"):
+        celsius, rh = self.rows[self.position]
+        if rh is None:
+            raise OSError("no reading in this row of the replay file")
+        return celsius, rh
+
+
+class SyntheticSource(SensorSource):
+    """A daily cycle of swing % around rh (with one sample every sample_minutes), plus random noise,
+    and a temperature that follows it."""
+
+    def __init__(self, rh=30, swing=5, noise=1, sample_minutes=15):
+        self.rh = rh
+        self.swing = swing
+        self.noise = noise
+        self.samples_per_day = 24 * 60 // sample_minutes
+        self.phase = 0
+
+    def seek(self, sample):
+        self.phase = 2 * math.pi * (sample % self.samples_per_day) / self.samples_per_day
+
+    def read(self, mode="high"):
+        cycle = math.sin(self.phase)
+        rh = self.rh + self.swing * cycle + random.uniform(-self.noise, self.noise)
+        return 20 - 3 * cycle, min(100, max(0, rh))
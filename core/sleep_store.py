@@ -0,0 +1,181 @@
+"""
+Persist program state in sleep memory (battery-backed RAM) across deep sleep.
+
+Sleep memory is laid out as two copies (A and B) of a small header, followed by a set of
+data regions (bytearrays, such as the RH history buffer):
+
+    [header A][header B][region 0][region 1]...
+
+The header holds a magic number, a sequence number, a layout id, the scalar state fields,
+and a checksum. An object with a FIELDS tuple of (name, struct format) pairs can keep those
+attributes in the header with register(), save_fields() and load_fields(). Each save writes only the regions (or parts of regions) that were marked
+dirty, then commits by writing the header into whichever of A/B holds the *older* copy.
+If power is lost partway through a save, the previous header is still intact, so the
+history survives with at most the slot being written affected.
+
+This module has no hardware imports: pass in alarm.sleep_memory on the device, or any
+bytearray on a desktop computer.
+"""
+
+import struct
+
+MAGIC = 0x5248  # "RH"
+LOAD_CHUNK = 512
+
+
+def fletcher16(data, start=0, end=None):
+    """Simple checksum for detecting torn or uninitialized headers."""
+    if end is None:
+        end = len(data)
+    a = 0
+    b = 0
+    for i in range(start, end):
+        a = (a + data[i]) % 255
+        b = (b + a) % 255
+    return (b << 8) | a
+
+
+class SleepStore:
+    """Scalar state plus bytearray regions, saved to and restored from sleep memory.
+
+    Fields and regions are registered with add_field() and add_region() before the first
+    load() or save(), which fixes the layout. Only the first size bytes of memory are used
+    (all of it by default), leaving the rest for other uses.
+    """
+
+    def __init__(self, memory, size=None):
+        self.memory = memory
+        self.size = len(memory) if size is None else size
+        self.names = []
+        self.formats = []
+        self.regions = []
+        self.offsets = None
+        self.state = {}
+        self.sequence = 0
+        self.dirty = []  # (start, end) range per region still to be written
+
+    def add_field(self, name, fmt):
+        """Register a scalar state value kept in the header, as a struct format character."""
+        if self.offsets is not None:
+            raise RuntimeError("sleep memory layout is already fixed")
+        self.names.append(name)
+        self.formats.append(fmt)
+        self.state[name] = 0
+
+    def register(self, obj, prefix=""):
+        """Register the attributes named in obj.FIELDS (obj may also be the class) as header fields,
+        each named prefix + its name."""
+        for name, fmt in obj.FIELDS:
+            self.add_field(prefix + name, fmt)
+
+    def save_fields(self, obj, prefix=""):
+        """Copy obj's attributes registered with register() into the state, ready for save()."""
+        for name, _ in obj.FIELDS:
+            self.state[prefix + name] = getattr(obj, name)
+
+    def load_fields(self, obj, prefix=""):
+        """Set obj's attributes registered with register() from the state, after load()."""
+        for name, _ in obj.FIELDS:
+            setattr(obj, name, self.state[prefix + name])
+
+    def add_region(self, region):
+        """Register a bytearray (or other writable buffer) stored after the headers, returning its index."""
+        if self.offsets is not None:
+            raise RuntimeError("sleep memory layout is already fixed")
+        self.regions.append(region)
+        self.dirty.append(None)
+        return len(self.regions) - 1
+
+    def _header_size(self):
+        # magic, sequence number, layout id, then the state fields, then the checksum
+        return struct.calcsize("<HHH" + "".join(self.formats)) + 2
+
+    def available(self):
+        """Bytes of sleep memory not yet claimed by the fields and regions registered so far."""
+        used = 2 * self._header_size()
+        for region in self.regions:
+            used += len(region)
+        return self.size - used
+
+    def _fix_layout(self):
+        if self.offsets is not None:
+            return
+        if self.available() < 0:
+            needed = self.size - self.available()
+            raise ValueError(f"sleep memory layout needs {needed} bytes, only {self.size} available")
+        self.header_format = "<HHH" + "".join(self.formats)
+        self.header_size = self._header_size()
+        self.offsets = []
+        offset = 2 * self.header_size
+        for region in self.regions:
+            self.offsets.append(offset)
+            offset += len(region)
+        # any change to the fields or region sizes invalidates previously saved data
+        layout = bytes(self.header_format, "utf-8") + bytes(str([len(r) for r in self.regions]), "utf-8")
+        self.layout_id = fletcher16(layout)
+        self._header = bytearray(self.header_size)
+
+    def _read_header(self, slot):
+        """Return (sequence, values) for header slot 0 or 1, or None if it is not valid."""
+        start = slot * self.header_size
+        header = bytes(self.memory[start : start + self.header_size])
+        checksum = header[-2] | (header[-1] << 8)
+        if checksum != fletcher16(header, 0, self.header_size - 2):
+            return None
+        values = struct.unpack_from(self.header_format, header)
+        if values[0] != MAGIC or values[2] != self.layout_id:
+            return None
+        return values[1], values[3:]
+
+    def load(self):
+        """Restore state and regions from the newest valid header. Return False if there is none."""
+        self._fix_layout()
+        a = self._read_header(0)
+        b = self._read_header(1)
+        if a is None and b is None:
+            return False
+        if a is None or (b is not None and (b[0] - a[0]) & 0xFFFF < 0x8000):
+            a = b
+        self.sequence = a[0]
+        for name, value in zip(self.names, a[1]):
+            self.state[name] = value
+        for region, offset in zip(self.regions, self.offsets):
+            # copy in chunks, to bound the temporary allocation for large regions
+            view = memoryview(region)
+            for i in range(0, len(region), LOAD_CHUNK):
+                n = min(LOAD_CHUNK, len(region) - i)
+                view[i : i + n] = self.memory[offset + i : offset + i + n]
+        self.dirty = [None] * len(self.regions)
+        return True
+
+    def mark_dirty(self, region_index, start, end=None):
+        """Flag region[start:end] as needing to be written on the next save()."""
+        if end is None:
+            end = start + 1
+        d = self.dirty[region_index]
+        if d is not None:
+            start = min(start, d[0])
+            end = max(end, d[1])
+        self.dirty[region_index] = (start, end)
+
+    def mark_all_dirty(self):
+        for i, region in enumerate(self.regions):
+            self.dirty[i] = (0, len(region))
+
+    def save(self):
+        """Write dirty regions, then commit the new state by writing the older of the two headers."""
+        self._fix_layout()
+        for i, d in enumerate(self.dirty):
+            if d is not None:
+                start = self.offsets[i] + d[0]
+                self.memory[start : start + d[1] - d[0]] = memoryview(self.regions[i])[d[0] : d[1]]
+                self.dirty[i] = None
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        header = self._header
+        values = [self.state[name] for name in self.names]
+        struct.pack_into(self.header_format, header, 0, MAGIC, self.sequence, self.layout_id, *values)
+        checksum = fletcher16(header, 0, self.header_size - 2)
+        header[-2] = checksum & 0xFF
+        header[-1] = checksum >> 8
+        start = (self.sequence % 2) * self.header_size
+        self.memory[start : start + self.header_size] = header
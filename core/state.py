@@ -0,0 +1,255 @@
+"""
+Everything that must survive deep sleep, and the per-wake logic around it: adding samples,
+choosing the next sample interval, flushing the flash log and planning for battery life.
+
+The sleep memory is passed in, so nothing here touches the hardware (the top-level wake_state.py
+is the glue that does).
+"""
+
+import random
+from config import DEBUG_MODE, DEBUG_SLEEP_MINUTES, SAMPLE_MINUTES, DISPLAY_MINUTES, NUM_BOXES
+from config import LOG_DIR, LOG_FLUSH_PERIODS, TARGET_DAYS, SAMPLE_MINUTES_OPTIONS, DISPLAY_MINUTES_OPTIONS
+from config import BATTERY_MAH, SLEEP_MA, AWAKE_MA, SAMPLE_WAKE_MS, REFRESH_MS
+from config import RH_BAND, RH_EVENT, MAX_SAMPLE_MINUTES, DESICCANT_RH, TREND_HALF_LIFE_DAYS, MIN_REFRESH_SECONDS
+from core.climate import encode_climate, decode_climate, dew_point
+from core.energy import encode_vbat, decode_vbat, state_of_charge, EnergyModel, choose_schedule
+from core.flash_log import FlashLog
+from core.history import History
+from core.refresh import RefreshScheduler
+from core import refresh
+from core.sleep_store import SleepStore
+from core.trend import Trend
+from core.wake_profile import profile
+from core import wake_profile
+
+
+class WakeState:
+    """Scalar state, RH history and flash log, kept in sleep memory between wakes."""
+
+    # scalar state saved in the sleep store header, as struct format characters
+    FIELDS = (
+        ("run_cycles", "H"),  # display wakes; wraps around after 2^16 (the battery won't last anywhere near that)
+        ("log_flushed", "I"),  # number of the last sample written to the flash log
+        ("screen_fingerprint", "I"),  # fingerprint of what is on screen (see views.view_fingerprint())
+        ("minutes_since_refresh", "H"),
+        ("minutes_since_display", "H"),
+        ("minutes_elapsed", "I"),  # since first boot or the battery was last charged
+        ("sample_minutes", "B"),  # current intervals, chosen by the battery life scheduler
+        ("display_minutes", "H"),
+        ("days_left", "H"),  # estimated battery life remaining
+        ("sleep_minutes", "B"),  # interval until the next sample, adapted to how fast RH is changing
+        ("rh_anchor", "B"),  # reading when sleep_minutes last changed
+        ("view", "B"),  # what the screen shows (see views.py)
+    )
+
+    def __init__(self, memory):
+        self.memory = memory
+        # the per-wake profile lives in a reserved area at the end of sleep memory
+        self.profile_offset = len(memory) - wake_profile.SIZE
+        # everything else that must survive deep sleep goes in the sleep store: scalar state in its
+        # (double-buffered) header, buffers as regions of which only the parts marked dirty are rewritten
+        self.store = SleepStore(memory, self.profile_offset)
+        self.store.register(self)
+        self.store.load_fields(self)  # all 0 until there is saved state to load
+        # trend of the daily mean RH, for the desiccant forecast
+        self.trend = Trend(TREND_HALF_LIFE_DAYS)
+        self.store.register(self.trend, "trend_")
+        # screen refreshes requested but not yet done (see refresh.py)
+        self.refresh = RefreshScheduler(MIN_REFRESH_SECONDS)
+        self.store.register(self.refresh, "refresh_")
+        self.screen_fingerprint = 0xFFFFFFFF  # never matches, as fingerprints are 24 bits
+        self.sample_minutes = SAMPLE_MINUTES
+        self.display_minutes = DISPLAY_MINUTES
+        self.sleep_minutes = SAMPLE_MINUTES
+        # RH history: raw samples for the last 48 hours, plus daily and then weekly min/mean/max entries
+        # going back as far as the rest of sleep memory allows (see history.py)
+        # battery voltage is kept alongside each raw sample, as channel 0, and RH and temperature
+        # packed into a 16-bit word (see climate.py), high byte in channel 1 and low byte in channel 2
+        self.history = History(self.store, SAMPLE_MINUTES, channels=3)
+        self.vbat = self.history.channels[0]
+        self.log = FlashLog(LOG_DIR, len(self.history.rings()), 1, SAMPLE_MINUTES)
+        self.first_boot = False
+        self.sampled = False  # a sample has been added this wake
+        self.event = False  # ...and RH changed by more than RH_EVENT
+        self.button_wake = False  # woken early by a button press
+
+    def load(self):
+        """Restore state from sleep memory, returning False if it holds no valid saved state."""
+        if not self.store.load():
+            return False
+        self.store.load_fields(self)
+        self.history.load_state()
+        self.store.load_fields(self.trend, "trend_")
+        self.store.load_fields(self.refresh, "refresh_")
+        return True
+
+    def init_first_boot(self):
+        print("**********************************")
+        print("first boot, initializing variables")
+        self.first_boot = True
+        # never refreshed, as far as the refresh scheduler knows, so the first display wake refreshes right away
+        self.minutes_since_refresh = 65535
+        # rebuild the recent history (enough to redraw the graph) from the tail of the flash log, if any
+        history = self.history
+        first, periods, records = self.log.tail(NUM_BOXES * history.daily.period)
+        if records:
+            print(f"rebuilding history from the last {len(records) // self.log.record_size} samples in the flash log")
+            history.rebuild(first, periods, records)
+            for age in range(min(NUM_BOXES, history.daily.capacity), 0, -1):
+                self.trend.add_day(history.daily.entry(age)[1])
+        self.log_flushed = history.total
+        if DEBUG_MODE and not records:
+            # seed with initial temporary dummy data
+            DUMMY_BOXES = 4
+            for b in range(DUMMY_BOXES):
+                for i in range(history.daily.period):
+                    history.add(50 - 10 * b + random.randint(-10, 10), (encode_vbat(4.0), 0, 0))
+        self.store.mark_all_dirty()
+
+    def save(self):
+        self.run_cycles %= 65536
+        self.store.save_fields(self)
+        self.history.save_state()
+        self.store.save_fields(self.trend, "trend_")
+        self.store.save_fields(self.refresh, "refresh_")
+        self.store.save()
+
+    def add_sample(self, current_rh, celsius, vbat):
+        """Round a new RH reading and add it to the history, along with the temperature (None for
+        no data) and battery voltage."""
+        rh = min(100, max(0, int(current_rh + 0.5)))
+        climate = encode_climate(current_rh if rh else None, celsius)
+        vbat_code = encode_vbat(vbat)
+        if vbat_code > self.vbat.latest() + 20 and self.vbat.latest() != 0:
+            print("battery voltage jumped up, assuming it was recharged")
+            self.minutes_elapsed = 0
+        # sleep_minutes is still the interval that was slept before this sample
+        weight = max(1, self.sleep_minutes // SAMPLE_MINUTES)
+        day = self.history.periods // self.history.daily.period
+        i = self.history.add(rh, (vbat_code, climate >> 8, climate & 0xFF), weight)
+        if self.history.periods // self.history.daily.period != day:
+            self.trend.add_day(self.history.daily.entry(1)[1])
+        print(f"humidity = {current_rh}%, battery = {vbat:.2f}V, saving to slot {i} in data buffer")
+        if celsius is not None and rh:
+            print(f"temperature = {celsius:.1f}C, dew point = {dew_point(current_rh, celsius):.1f}C")
+        self.sampled = True
+        self.adapt_interval(rh)
+
+    def climate(self):
+        """Return the latest (RH, temperature, dew point), at the resolution kept in the history,
+        with None for anything missing."""
+        channels = self.history.channels
+        rh, celsius = decode_climate(channels[1].latest() << 8 | channels[2].latest())
+        return rh, celsius, dew_point(rh, celsius)
+
+    def desiccant_days(self):
+        """Forecast the days until the daily mean RH reaches DESICCANT_RH, counting the day so far,
+        or None if it is not rising."""
+        daily = self.history.daily
+        days = self.trend.days_to(DESICCANT_RH, daily.current_mean(), daily.inputs / daily.period)
+        if days is None:
+            return None
+        return min(999, int(max(0, days - daily.inputs / daily.period) + 0.5))
+
+    def button_pressed(self, view):
+        """Switch the screen to view, after a button press woke the board.
+
+        The minute counts were added for the whole sleep when it began, and there is no clock that
+        keeps time through deep sleep to tell how much of it the press cut short, so the time since the
+        last refresh is taken back to what it was when the sleep began, so the panel is never
+        refreshed too soon."""
+        self.button_wake = True
+        self.select_view(view)
+        self.minutes_since_refresh = max(0, self.minutes_since_refresh - self.sleep_length())
+
+    def select_view(self, view):
+        """Switch the screen to view, after a button press, at the next refresh it allows."""
+        print(f"button pressed, showing view {view}")
+        self.view = view
+        self.refresh.request(refresh.VIEW)
+
+    def sleep_length(self):
+        """Minutes of the sleep that ends this wake (and until end_wake(), of the one that began it)."""
+        return DEBUG_SLEEP_MINUTES if DEBUG_MODE else self.sleep_minutes
+
+    def adapt_interval(self, rh):
+        """Choose the interval to the next sample from how far RH has moved (see RH_BAND in config.py)."""
+        if rh == 0:
+            return  # no reading, keep the current interval
+        change = abs(rh - self.rh_anchor)
+        if self.rh_anchor == 0 or RH_BAND < change <= RH_EVENT:
+            self.sleep_minutes = self.sample_minutes
+            self.rh_anchor = rh
+        elif change > RH_EVENT:
+            print(f"RH changed by {change}%, sampling every {SAMPLE_MINUTES} minutes and refreshing the screen")
+            self.sleep_minutes = SAMPLE_MINUTES
+            self.rh_anchor = rh
+            self.event = True
+        else:
+            # steady: back off, but never sample less often than the battery life scheduler allows
+            self.sleep_minutes = min(MAX_SAMPLE_MINUTES, max(self.sample_minutes, 2 * self.sleep_minutes))
+
+    def flush_log(self):
+        """Write the samples staged in the raw history tier out to the flash log, once they cover a day
+        (see LOG_FLUSH_PERIODS in config.py)."""
+        history = self.history
+        staged = min(history.total - self.log_flushed, history.raw.capacity)
+        if sum(sum(view) for view in history.intervals.recent(staged)) < LOG_FLUSH_PERIODS:
+            return
+        try:
+            self.log_flushed = self.log.append(history.rings(), history.total, history.periods, self.log_flushed)
+        except OSError as e:
+            # most likely the filesystem is not writable (see boot.py): keep staging and try again later
+            print(f"could not write to flash log: {e}")
+
+    def update_schedule(self):
+        """Estimate the battery days left, and choose the sample and display intervals that should
+        still meet TARGET_DAYS (counted from the last charge)."""
+        # average the last few readings, as the voltage sags briefly after each refresh
+        codes = [v for view in self.vbat.recent(8) for v in view if v]
+        if not codes:
+            return
+        soc = state_of_charge(decode_vbat(sum(codes) / len(codes)))
+        model = EnergyModel(BATTERY_MAH, SLEEP_MA, AWAKE_MA, SAMPLE_WAKE_MS, REFRESH_MS)
+        model.calibrate(profile.load(self.memory, self.profile_offset))
+        if not DEBUG_MODE:
+            days_needed = max(1, TARGET_DAYS - self.minutes_elapsed // (24 * 60))
+            self.sample_minutes, self.display_minutes = choose_schedule(
+                model, soc, days_needed, SAMPLE_MINUTES_OPTIONS, DISPLAY_MINUTES_OPTIONS
+            )
+        self.days_left = min(9999, int(model.days_left(soc, self.sample_minutes, self.display_minutes)))
+        print(
+            f"battery {soc:.0f}%, sampling every {self.sample_minutes} min, display every "
+            f"{self.display_minutes} min, ~{self.days_left} days left"
+        )
+
+    def display_due(self):
+        # a refresh deferred from an earlier wake (see refresh.py) makes this a display wake as well
+        if self.refresh.pending:
+            return True
+        return DEBUG_MODE or self.first_boot or self.minutes_since_display >= self.display_minutes
+
+    def end_wake(self):
+        """Save state and this wake's profile to sleep memory, ready for deep sleep, and return the
+        number of minutes to sleep until the next sample is due."""
+        if self.button_wake:
+            # start the sleep the press cut short over again, rather than count it twice (see
+            # button_pressed()), so elapsed time runs slow by however much of it had passed
+            minutes = self.sleep_length()
+            self.minutes_since_refresh = min(65535, self.minutes_since_refresh + minutes)
+        else:
+            # never sleep past the next display update, so backing off the sample interval while RH is
+            # steady doesn't stretch the display interval as well, and take at least one sample-only
+            # sample in between
+            until_display = self.display_minutes - self.minutes_since_display
+            limit = min(self.display_minutes // 2, until_display) // SAMPLE_MINUTES * SAMPLE_MINUTES
+            self.sleep_minutes = max(SAMPLE_MINUTES, min(self.sleep_minutes, limit))
+            minutes = self.sleep_length()
+            self.minutes_since_refresh = min(65535, self.minutes_since_refresh + minutes)
+            self.minutes_since_display = min(65535, self.minutes_since_display + minutes)
+            self.minutes_elapsed += minutes
+        print(f"entering deep sleep for {minutes} minutes, saving critical data to sleep memory...")
+        self.save()
+        profile.mark("save")
+        profile.commit(self.memory, self.profile_offset)
+        return minutes
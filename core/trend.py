@@ -0,0 +1,65 @@
+"""
+Trend of the daily mean RH, to forecast when the desiccant will be used up.
+
+An exponentially weighted least squares line through the daily means, kept as five running sums
+(saved in the sleep store header), so each completed day updates it in O(1) without rescanning
+the history. Days are counted back from the most recent one (x = 0, the day before x = -1), so
+the sums are shifted along one day at a time and never grow, which keeps single-precision floats
+accurate. A day's weight halves every half_life days.
+"""
+
+
+class Trend:
+    # saved in the sleep store header (see SleepStore.register())
+    FIELDS = (("w", "f"), ("x", "f"), ("xx", "f"), ("y", "f"), ("xy", "f"))
+
+    def __init__(self, half_life):
+        self.decay = 0.5 ** (1 / half_life)
+        self.w = 0.0  # sums of weights, and of weighted x, x * x, y and x * y
+        self.x = 0.0
+        self.xx = 0.0
+        self.y = 0.0
+        self.xy = 0.0
+
+    def add_day(self, mean):
+        """Move on to a new day, with its mean RH (0 for a day without data)."""
+        d = self.decay
+        # shift x down by one, so the new day is at 0, then decay the older days' weights
+        self.xx = d * (self.xx - 2 * self.x + self.w)
+        self.xy = d * (self.xy - self.y)
+        self.x = d * (self.x - self.w)
+        self.y = d * self.y
+        self.w = d * self.w
+        if mean:
+            self.w += 1
+            self.y += mean
+
+    def fit(self, partial=0, partial_weight=0):
+        """Return (level, slope per day) of the line at the most recent day, optionally with a
+        partial day's mean counted at x = 1 with a weight of the fraction of the day it covers,
+        or None if there are fewer than two days' worth of data to fit."""
+        w, x, xx, y, xy = self.w, self.x, self.xx, self.y, self.xy
+        if partial:
+            w += partial_weight
+            x += partial_weight
+            xx += partial_weight
+            y += partial_weight * partial
+            xy += partial_weight * partial
+        det = w * xx - x * x
+        if w < 1.5 or det <= 1e-6:
+            return None
+        slope = (w * xy - x * y) / det
+        return (y - slope * x) / w, slope
+
+    def days_to(self, threshold, partial=0, partial_weight=0):
+        """Days from the most recent day until the trend line reaches threshold: 0 if it is already
+        there, None if it is not rising (or there is not enough data yet)."""
+        line = self.fit(partial, partial_weight)
+        if line is None:
+            return None
+        level, slope = line
+        if level >= threshold:
+            return 0
+        if slope <= 0:
+            return None
+        return (threshold - level) / slope
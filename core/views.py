@@ -0,0 +1,56 @@
+"""
+The views the screen can switch between (with the Featherwing buttons, see BUTTON_PINS in
+config.py), and the data each one shows.
+
+Each view declares what it needs, and view_data() computes only that, so a wake showing the big
+RH number never pays for laying out the graph or fitting the desiccant trend. How each view is
+drawn is in screen.py.
+"""
+
+from config import DENSE_GRAPH
+from core.graph_layout import layout_data, dense_layout, fingerprint, hash_values
+
+GRAPH = 0  # daily box and whisker graph (or the dense one, see DENSE_GRAPH in config.py), with the current RH,
+# battery days left and desiccant forecast
+NUMBER = 1  # the current RH, as big as it fits
+CLIMATE = 2  # temperature, RH and dew point
+NEEDS = (
+    ("rh", "graph", "days_left", "forecast"),
+    ("rh",),
+    ("climate",),
+)
+
+
+def view_data(state, view):
+    """Return a dict of the data view shows, from the wake state, computing only what it needs."""
+    needs = NEEDS[view]
+    data = {}
+    if "rh" in needs:
+        data["rh"] = state.history.latest()
+    if "graph" in needs and DENSE_GRAPH:
+        data["columns"], data["highlight"], data["readout_y"] = dense_layout(state.history)
+    elif "graph" in needs:
+        data["boxes"], data["highlight"], data["readout_y"] = layout_data(state.history)
+    if "days_left" in needs:
+        data["days_left"] = state.days_left
+    if "forecast" in needs:
+        data["desiccant_days"] = state.desiccant_days()
+    if "climate" in needs:
+        data["climate"] = state.climate()
+    return data
+
+
+def view_fingerprint(view, data):
+    """Hash what view would show with data (24 bits), to tell when a refresh would not change anything."""
+    if view == GRAPH:
+        shapes = (data["columns"],) if DENSE_GRAPH else data["boxes"]
+        h = fingerprint(
+            data["rh"], shapes, data["highlight"], data["readout_y"], data["days_left"], data["desiccant_days"]
+        )
+    elif view == NUMBER:
+        h = data["rh"]
+    else:
+        # to the tenth of a degree or percent shown, with -1 for no data
+        h = hash_values([-1 if v is None else int(10 * v) & 0xFFFF for v in data["climate"]])
+    # views hash differently, so switching view always counts as a change
+    return (h * 31 + view + 1) & 0xFFFFFF
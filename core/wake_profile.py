@@ -0,0 +1,100 @@
+"""
+Lightweight per-phase timing of each wake cycle, kept across deep sleep.
+
+Each wake, mark() is called at the end of each named phase (imports, loading state, reading
+the sensor, ...), recording the time since the previous mark and gc.mem_free() at that point.
+Just before deep sleep, commit() writes the cycle's record into a small ring in a reserved
+area at the end of sleep memory (outside the SleepStore), so the last few cycles can be
+inspected: dump() prints them as a table, and summary() gives a one-line version of the
+previous cycle for a debug corner of the screen.
+
+Import this first thing in code.py, so the first phase covers the other imports.
+"""
+
+import struct
+import time
+
+try:
+    from gc import mem_free
+except ImportError:
+    # not available outside CircuitPython/MicroPython, e.g. when running on a desktop computer
+    def mem_free():
+        return 0
+
+
+PHASES = ("import", "load", "sensor", "log", "layout", "display", "refresh", "save")
+KINDS = ("sample", "display")
+CYCLES = 8  # cycles kept in the rolling window
+
+# each record: wake kind, then elapsed ms and mem_free // 16 for each phase
+RECORD_FORMAT = "<B" + "HH" * len(PHASES)
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+MAGIC = 0x5A
+# area layout: magic, index of the most recent record, number of records, then the records
+SIZE = 3 + CYCLES * RECORD_SIZE
+
+
+class WakeProfile:
+    """Phase timings for the current wake, plus the rolling window of past ones in sleep memory."""
+
+    def __init__(self):
+        self.last = time.monotonic_ns()
+        self.times = [0] * len(PHASES)
+        self.mem = [0] * len(PHASES)
+        self.kind = 0
+
+    def mark(self, phase):
+        """Record the end of a phase: time since the previous mark, and current free memory."""
+        now = time.monotonic_ns()
+        i = PHASES.index(phase)
+        self.times[i] += (now - self.last) // 1000000
+        self.mem[i] = mem_free()
+        self.last = now
+
+    def _records(self, memory, offset):
+        """Return (head, count) of the ring at memory[offset:], or (0, 0) if it holds no records."""
+        if memory[offset] != MAGIC or memory[offset + 1] >= CYCLES:
+            return 0, 0
+        return memory[offset + 1], min(memory[offset + 2], CYCLES)
+
+    def commit(self, memory, offset):
+        """Write this wake's record into the ring in memory[offset : offset + SIZE]."""
+        head, count = self._records(memory, offset)
+        head = (head + 1) % CYCLES
+        values = []
+        for t, m in zip(self.times, self.mem):
+            values.append(min(65535, t))
+            values.append(min(65535, m // 16))
+        start = offset + 3 + head * RECORD_SIZE
+        memory[start : start + RECORD_SIZE] = struct.pack(RECORD_FORMAT, self.kind, *values)
+        memory[offset : offset + 3] = bytes((MAGIC, head, min(count + 1, CYCLES)))
+
+    def load(self, memory, offset):
+        """Return the saved records, oldest first, as (kind, [ms per phase], [mem_free per phase])."""
+        head, count = self._records(memory, offset)
+        records = []
+        for age in range(count - 1, -1, -1):
+            start = offset + 3 + ((head - age) % CYCLES) * RECORD_SIZE
+            values = struct.unpack(RECORD_FORMAT, bytes(memory[start : start + RECORD_SIZE]))
+            times = [values[1 + 2 * i] for i in range(len(PHASES))]
+            mem = [16 * values[2 + 2 * i] for i in range(len(PHASES))]
+            records.append((values[0], times, mem))
+        return records
+
+    def dump(self, memory, offset):
+        """Print the saved records as a table: ms per phase, total ms awake, and the lowest free memory seen."""
+        print("wake     " + " ".join(f"{p:>7}" for p in PHASES) + "   total  min_free")
+        for kind, times, mem in self.load(memory, offset):
+            min_free = min(m for m in mem if m) if any(mem) else 0
+            print(f"{KINDS[kind]:<8} " + " ".join(f"{t:>7}" for t in times) + f" {sum(times):>7} {min_free:>9}")
+
+    def summary(self, memory, offset):
+        """One line describing the most recent saved record, for a debug corner of the screen."""
+        records = self.load(memory, offset)
+        if not records:
+            return ""
+        kind, times, mem = records[-1]
+        return f"{KINDS[kind][0]} {sum(times)}ms r{times[PHASES.index('refresh')]}"
+
+
+profile = WakeProfile()
@@ -0,0 +1,182 @@
+"""
+Run simulated wake cycles on a desktop computer, and report time and memory allocated per phase.
+
+    python3 host/bench.py -n 200
+    python3 host/bench.py -n 200 --save before.json
+    (make a change)
+    python3 host/bench.py -n 200 --compare before.json
+
+The device modules are replaced by the stand-ins in host/stubs. Each wake runs code.py from
+scratch, with the project's modules unloaded in between as RAM is lost in deep sleep (only
+alarm.sleep_memory carries over), and ends when it calls alarm.exit_and_deep_sleep_until_alarms().
+
+Phases are the ones marked in core/wake_profile.py. Time is measured with time.perf_counter_ns() and
+allocations with tracemalloc (the peak allocated above the level at the start of each phase), so
+the numbers are only comparable between runs on the same computer, and not with the device.
+Fixed delays such as time.sleep() are skipped, and the flash log and cached bitmaps are written
+to a temporary directory.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import runpy
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HOST)
+sys.path[:0] = [os.path.join(HOST, "stubs"), ROOT]
+
+import adafruit_il0373
+import adafruit_sht4x
+import alarm
+import config
+
+# the project's own modules, reloaded every wake (config stays loaded, so it can be overridden here)
+PROJECT_MODULES = ["code", "core"]
+PROJECT_MODULES += [name[:-3] for name in os.listdir(ROOT) if name.endswith(".py") and name != "config.py"]
+PROJECT_MODULES += ["core." + name[:-3] for name in os.listdir(os.path.join(ROOT, "core")) if name.endswith(".py")]
+KINDS = ("sample", "display")
+CODE = os.path.join(ROOT, "code.py")
+
+
+class PhaseRecorder:
+    """Time and peak allocations for each phase of the current wake, recorded at each profile.mark()."""
+
+    def reset(self):
+        self.times = {}
+        self.allocs = {}
+        tracemalloc.reset_peak()
+        self.base = tracemalloc.get_traced_memory()[0]
+        self.last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        now = time.perf_counter_ns()
+        current, peak = tracemalloc.get_traced_memory()
+        self.times[phase] = self.times.get(phase, 0) + now - self.last
+        self.allocs[phase] = self.allocs.get(phase, 0) + peak - self.base
+        tracemalloc.reset_peak()
+        self.base = current
+        self.last = time.perf_counter_ns()
+
+
+def run_code():
+    runpy.run_path(CODE)
+
+
+def wake(recorder=None, verbose=False, run=run_code):
+    """Run code.py once (by calling run), from a fresh set of modules, until it goes into deep sleep.
+    Return the wake profile for it (see core/wake_profile.py). If recorder is given, it is reset at the
+    start and marked along with the profile."""
+    for name in PROJECT_MODULES:
+        sys.modules.pop(name, None)
+    from core import wake_profile
+
+    if recorder:
+        mark = wake_profile.WakeProfile.mark
+
+        def recording_mark(self, phase):
+            recorder.mark(phase)
+            mark(self, phase)
+
+        wake_profile.WakeProfile.mark = recording_mark
+        recorder.reset()
+    out = sys.stdout if verbose else io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            run()
+    except alarm.DeepSleep as e:
+        alarm.wake_alarm = e.alarms[0]
+    else:
+        raise RuntimeError("code.py returned without going into deep sleep")
+    return wake_profile.profile
+
+
+def run(n, verbose=False):
+    """Run n wakes from a first boot, returning the mean ms and KB allocated per phase for each kind
+    of wake, as {kind: {phase: [ms, kb]}}, and the number of wakes of each kind."""
+    recorder = PhaseRecorder()
+    totals = {kind: {} for kind in KINDS}
+    counts = {kind: 0 for kind in KINDS}
+    for _ in range(n):
+        profile = wake(recorder, verbose)
+        kind = KINDS[profile.kind]
+        counts[kind] += 1
+        for phase, ns in recorder.times.items():
+            t = totals[kind].setdefault(phase, [0, 0])
+            t[0] += ns / 1e6
+            t[1] += recorder.allocs[phase] / 1024
+    means = {}
+    for kind in KINDS:
+        means[kind] = {phase: [ms / counts[kind], kb / counts[kind]] for phase, (ms, kb) in totals[kind].items()}
+    return means, counts
+
+
+def report(means, counts, baseline=None):
+    """Print a table of ms and KB per phase for each kind of wake, with the change from baseline if given."""
+    from core.wake_profile import PHASES
+
+    for kind in KINDS:
+        if not counts[kind]:
+            continue
+        print(f"{kind} wakes: {counts[kind]}")
+        print(f"  {'phase':<8} {'ms':>9} {'KB':>9}")
+        rows = [(phase, means[kind][phase]) for phase in PHASES if phase in means[kind]]
+        rows.append(("total", [sum(v[0] for _, v in rows), sum(v[1] for _, v in rows)]))
+        for phase, (ms, kb) in rows:
+            line = f"  {phase:<8} {ms:>9.2f} {kb:>9.1f}"
+            if baseline and kind in baseline:
+                if phase == "total":
+                    before = [sum(v[0] for v in baseline[kind].values()), sum(v[1] for v in baseline[kind].values())]
+                else:
+                    before = baseline[kind].get(phase)
+                if before and before[0]:
+                    line += f"   {ms - before[0]:+9.2f} ms ({100 * (ms / before[0] - 1):+.0f}%) {kb - before[1]:+9.1f} KB"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-n", type=int, default=100, help="number of wakes to simulate (default 100)")
+    parser.add_argument("--rh", type=float, default=adafruit_sht4x.DEFAULT_RH, help="steady RH reading")
+    parser.add_argument(
+        "--sensor", default="sht4x", help="sensor source (see SENSOR in config.py): sht4x, the stand-in, by default"
+    )
+    parser.add_argument("--replay-file", help="readings for --sensor replay (see core/sensor_sources.py)")
+    parser.add_argument("--save", help="save the results as JSON, to compare a later run against")
+    parser.add_argument("--compare", help="show the change from results saved with --save")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the output of each wake")
+    args = parser.parse_args()
+
+    config.LOG_DIR = os.path.join(tempfile.mkdtemp(), "log")
+    config.CHROME_BMP = os.path.join(os.path.dirname(config.LOG_DIR), "chrome.bmp")
+    config.GLYPHS_BMP = os.path.join(os.path.dirname(config.LOG_DIR), "glyphs.bmp")
+    adafruit_sht4x.DEFAULT_RH = args.rh
+    config.SENSOR = args.sensor
+    if args.replay_file:
+        config.SENSOR_REPLAY_FILE = args.replay_file
+    time.sleep = lambda seconds: None
+    tracemalloc.start()
+    start = time.perf_counter()
+    means, counts = run(args.n, args.verbose)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(means, counts, baseline)
+    print(f"{args.n} wakes in {elapsed:.2f} s, {len(adafruit_il0373.refreshes)} screen refreshes")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(means, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
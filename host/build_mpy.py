@@ -0,0 +1,56 @@
+"""
+Build a copy of the CIRCUITPY drive contents in build/CIRCUITPY, with the core package
+precompiled to .mpy, so the board does not have to parse and compile it at every wake.
+
+    python3 host/build_mpy.py [--mpy-cross PATH]
+
+mpy-cross must be the one released with the CircuitPython version on the board (.mpy files from
+a different version won't load). To install the build, copy build/CIRCUITPY over the drive, and
+delete any core/*.py already there: CircuitPython imports a .py in preference to a .mpy.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HOST)
+
+# the top-level scripts stay as source: they are short, and easy to edit on the drive
+SCRIPTS = (
+    "boot.py",
+    "code.py",
+    "config.py",
+    "main_humidity_eink.py",
+    "sample_wake.py",
+    "screen.py",
+    "sensor.py",
+    "wake_state.py",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--mpy-cross", default="mpy-cross", help="path to the mpy-cross compiler")
+    parser.add_argument("--out", default=os.path.join(ROOT, "build", "CIRCUITPY"), help="output directory")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        shutil.rmtree(args.out)
+    os.makedirs(os.path.join(args.out, "core"))
+    for name in SCRIPTS:
+        shutil.copy(os.path.join(ROOT, name), args.out)
+    shutil.copytree(os.path.join(ROOT, "lib"), os.path.join(args.out, "lib"))
+    for name in sorted(os.listdir(os.path.join(ROOT, "core"))):
+        if not name.endswith(".py"):
+            continue
+        src = os.path.join(ROOT, "core", name)
+        dst = os.path.join(args.out, "core", name[:-3] + ".mpy")
+        # compile under the name it is imported by, so tracebacks on the device point at the right file
+        subprocess.run([args.mpy_cross, "-s", "core/" + name, "-o", dst, src], check=True)
+        print(f"{src} -> {dst} ({os.path.getsize(src)} -> {os.path.getsize(dst)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
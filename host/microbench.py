@@ -0,0 +1,86 @@
+"""
+Time the hot functions of the core package on their own, without running whole wakes.
+
+    python3 host/microbench.py
+
+Each benchmark runs its function repeatedly against realistic state (a full sleep memory
+layout, a history a few weeks deep) and prints the mean time per call. As with bench.py, the
+numbers only mean something relative to another run on the same computer.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HOST, "stubs"), os.path.dirname(HOST)]
+
+from core.flash_log import FlashLog
+from core.graph_layout import layout_data, dense_layout, fingerprint
+from core.history import History
+from core.sleep_store import SleepStore
+
+SAMPLE_MINUTES = 15
+MEMORY_SIZE = 8192
+
+
+def new_history(days=30, seed=1):
+    """A store and history in a fresh sleep memory, with days of random samples added."""
+    rng = random.Random(seed)
+    store = SleepStore(bytearray(MEMORY_SIZE))
+    history = History(store, SAMPLE_MINUTES, channels=1)
+    for _ in range(days * 24 * 60 // SAMPLE_MINUTES):
+        history.add(rng.randint(10, 20), (rng.randint(150, 170),), rng.choice((1, 1, 2, 4)))
+    history.save_state()
+    store.save()
+    return store, history
+
+
+def timed(name, function, n):
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        function()
+    us = (time.perf_counter_ns() - start) / n / 1000
+    print(f"  {name:<34} {us:>10.2f} us")
+
+
+def main():
+    store, history = new_history()
+    print("per call:")
+    rng = random.Random(2)
+    timed("History.add", lambda: history.add(rng.randint(10, 20), (160,), 1), 20000)
+
+    def add_and_save():
+        history.add(rng.randint(10, 20), (160,), 1)
+        history.save_state()
+        store.save()
+
+    timed("History.add + SleepStore.save", add_and_save, 5000)
+    store.mark_all_dirty()
+    timed("SleepStore.save (all dirty)", lambda: (store.mark_all_dirty(), store.save()), 2000)
+    timed("SleepStore.load", store.load, 2000)
+    timed("History.rings + recent(96)", lambda: [ring.recent(96) for ring in history.rings()], 20000)
+
+    def layout():
+        boxes, highlight, readout_y = layout_data(history)
+        fingerprint(history.latest(), boxes, highlight, readout_y, 90, 30)
+
+    timed("layout_data + fingerprint", layout, 5000)
+
+    def dense():
+        columns, highlight, readout_y = dense_layout(history)
+        fingerprint(history.latest(), (columns,), highlight, readout_y, 90, 30)
+
+    timed("dense_layout + fingerprint", dense, 2000)
+
+    log = FlashLog(os.path.join(tempfile.mkdtemp(), "log"), len(history.rings()), 1, SAMPLE_MINUTES)
+    # the same samples each time, so each append starts a new segment (and rotates out old ones)
+    flush = lambda: log.append(history.rings(), history.total, history.periods, history.total - 96)
+    timed("FlashLog.append (96, new segment)", flush, 200)
+    timed("FlashLog.tail (1824 samples)", lambda: log.tail(1824), 200)
+
+
+if __name__ == "__main__":
+    main()
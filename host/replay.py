@@ -0,0 +1,427 @@
+"""
+Replay months or years of simulated wakes through the real code, checking the history and the
+graph after every wake.
+
+    python3 host/replay.py steady lid ramp dropout --days 730
+    python3 host/replay.py recorded.csv
+
+Each scenario gives the RH reading at any time since the first boot: steady (dry box holding at
+~15%), lid (lid opened every few days, then recovering), ramp (desiccant slowly saturating, then
+swapped) and dropout (sensor failing to respond, now and then for hours at a time). A CSV trace
+has rows of minutes since the start and RH, with an empty RH for a failed read; each reading holds
+until the next row.
+
+Wakes run code.py exactly as bench.py does, with the stand-ins in host/stubs, but each module is
+compiled only once, so a year of wakes takes seconds. The wake interval is whatever the code
+chose (read back from its deep sleep alarm), and after every wake the replay checks that:
+
+  * the latest raw sample is the rounded reading, and the packed RH and temperature are within
+    half a step of the reading and the sensor stand-in's temperature
+  * the history's sample period count, and its day and week boundaries, match the simulated clock
+  * the daily and weekly (min, mean, max) entries match ones computed here from the readings, with
+    the weekly ones starting past the end of the daily tier
+  * the daily quartiles are within one sketch bin of exact ones computed here (see core/quantiles.py)
+  * the desiccant trend's sums match ones computed here from the daily means
+  * run_cycles counts display wakes (modulo 2^16)
+  * the graph boxes are in order, inside the graph, with min <= q1 <= median <= q3 <= max, or with
+    --dense, each raw sample is within its column of the dense graph
+  * after a refresh, the screen reads the latest sample, in the view last chosen
+  * refreshes are at least MIN_REFRESH_SECONDS apart
+
+With --buttons N, a view button (see BUTTON_PINS in config.py) is pressed during every Nth wake,
+caught if that wake waits for one after refreshing the screen; the replay then also checks that
+the screen was refreshed again to show that button's view.
+"""
+
+import argparse
+import bisect
+import importlib.abc
+import importlib.util
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench import PROJECT_MODULES, ROOT, wake
+import adafruit_il0373
+import adafruit_sht4x
+import alarm
+import board
+import config
+from core.quantiles import BINS
+
+MAX_FAILURES = 10  # stop a scenario after this many failed checks
+
+
+class CompiledModules(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Import the project's modules from code compiled once, instead of from source at every wake."""
+
+    def __init__(self):
+        self.code = {}
+
+    def compiled(self, name):
+        if name not in self.code:
+            path = os.path.join(ROOT, *name.split(".")) + ".py"
+            if name == "core":
+                path = os.path.join(ROOT, "core", "__init__.py")
+            with open(path) as f:
+                self.code[name] = compile(f.read(), path, "exec")
+        return self.code[name]
+
+    def find_spec(self, name, path=None, target=None):
+        if name in PROJECT_MODULES and name != "code":
+            return importlib.util.spec_from_loader(name, self, is_package=name == "core")
+        return None
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        exec(self.compiled(module.__name__), module.__dict__)
+
+    def run_code(self):
+        exec(self.compiled("code"), {"__name__": "__main__"})
+
+
+### Scenarios: each returns a function of minutes since first boot, giving the RH reading or None
+
+
+def steady(rng):
+    return lambda minutes: 15 + rng.gauss(0, 0.3)
+
+
+def lid(rng):
+    """Lid opened for a few minutes every 2-4 days, letting RH jump to 40-60%, then decaying back
+    to ~15% over several hours."""
+    openings = []
+    t = 0
+    while len(openings) < 10000:
+        t += rng.uniform(2, 4) * 24 * 60
+        openings.append((t, rng.uniform(40, 60)))
+
+    def rh(minutes):
+        i = bisect.bisect(openings, (minutes, math.inf)) - 1
+        if i < 0:
+            return 15 + rng.gauss(0, 0.3)
+        opened, peak = openings[i]
+        return 15 + (peak - 15) * math.exp(-(minutes - opened) / 180) + rng.gauss(0, 0.3)
+
+    return rh
+
+
+def ramp(rng):
+    """Desiccant saturating: RH creeps up from 12% by ~0.5% a day, until it is swapped at 40%."""
+    days_per_cycle = (40 - 12) / 0.5
+    return lambda minutes: 12 + 0.5 * ((minutes / (24 * 60)) % days_per_cycle) + rng.gauss(0, 0.2)
+
+
+def dropout(rng):
+    """Steady, but about 1% of reads fail, and every 5 days the sensor is gone for 6 hours."""
+
+    def rh(minutes):
+        if (minutes % (5 * 24 * 60)) < 6 * 60 and minutes > 24 * 60 or rng.random() < 0.01:
+            return None
+        return 15 + rng.gauss(0, 0.3)
+
+    return rh
+
+
+def csv_trace(path):
+    times = []
+    values = []
+    with open(path) as f:
+        for line in f:
+            fields = line.strip().split(",")
+            try:
+                minutes = float(fields[0])
+            except ValueError:
+                continue  # header or blank line
+            times.append(minutes)
+            values.append(float(fields[1]) if len(fields) > 1 and fields[1].strip() else None)
+
+    def rh(minutes):
+        return values[max(0, bisect.bisect(times, minutes) - 1)]
+
+    return rh
+
+
+SCENARIOS = {"steady": steady, "lid": lid, "ramp": ramp, "dropout": dropout}
+
+
+class Expected:
+    """Daily and weekly (min, mean, max) entries computed independently from the readings, the way
+    the history should have: each sample counts for the day its interval started in."""
+
+    def __init__(self, period):
+        self.period = period
+        self.periods = 0
+        self.days = {}  # day: [low, high, sum, count] of weighted samples with data
+        self.weights = {}  # day: {rh: total weight}
+
+    def add(self, rh, weight):
+        day = self.periods // self.period
+        self.periods += weight
+        if rh == 0:
+            self.days.setdefault(day, [0, 0, 0, 0])
+            return
+        d = self.days.setdefault(day, [0, 0, 0, 0])
+        if d[3] == 0 or rh < d[0]:
+            d[0] = rh
+        d[1] = max(d[1], rh)
+        d[2] += rh * weight
+        d[3] += weight
+        weights = self.weights.setdefault(day, {})
+        weights[rh] = weights.get(rh, 0) + weight
+
+    def day(self, day):
+        d = self.days.get(day)
+        if not d or d[3] == 0:
+            return 0, 0, 0
+        return d[0], (d[2] + d[3] // 2) // d[3], d[1]
+
+    def quantile(self, day, q):
+        """The exact weighted quantile of the day's samples, as QuantileSketch.quantile() defines it."""
+        weights = self.weights.get(day)
+        if not weights:
+            return 0
+        target = q * sum(weights.values())
+        count = 0
+        for rh in sorted(weights):
+            count += weights[rh]
+            if count > target:
+                return rh
+
+    def trend(self, decay):
+        """The Trend sums (w, x, xx, y, xy) over the completed days, with the latest at x = 0."""
+        latest = self.periods // self.period - 1
+        sums = [0, 0, 0, 0, 0]
+        for day in self.days:
+            mean = self.day(day)[1]
+            if day > latest or not mean:
+                continue
+            x = day - latest
+            w = decay ** -x
+            for i, v in enumerate((w, w * x, w * x * x, w * mean, w * x * mean)):
+                sums[i] += v
+        return sums
+
+    def week(self, week):
+        entries = [self.day(day) for day in range(7 * week, 7 * week + 7)]
+        entries = [e for e in entries if e[1]]
+        if not entries:
+            return 0, 0, 0
+        mean = (sum(e[1] for e in entries) + len(entries) // 2) // len(entries)
+        return min(e[0] for e in entries), mean, max(e[2] for e in entries)
+
+    def prune(self, keep):
+        """Forget days older than keep days before the current one."""
+        oldest = self.periods // self.period - keep
+        for day in [day for day in self.days if day < oldest]:
+            del self.days[day]
+            self.weights.pop(day, None)
+
+
+def check(state, expected, reading, display_wakes, refreshed):
+    """Return a list of the invariants that do not hold after a wake."""
+    from core import graph_layout
+
+    h = state.history
+    failures = []
+    rh = 0 if reading is None else min(100, max(0, int(reading + 0.5)))
+    if h.latest() != rh:
+        failures.append(f"latest sample {h.latest()}, expected {rh}")
+    fine_rh, celsius, _ = state.climate()
+    if reading is None or rh == 0:
+        if fine_rh is not None or celsius is not None:
+            failures.append(f"climate {fine_rh}%, {celsius}C stored for a failed reading")
+    elif abs(fine_rh - min(100, reading)) > 0.25 or celsius != adafruit_sht4x.SHT4x(None).temperature:
+        failures.append(f"climate {fine_rh}%, {celsius}C stored for a reading of {reading}%")
+    if h.periods != expected.periods:
+        failures.append(f"history at sample period {h.periods}, expected {expected.periods}")
+    day = h.periods // h.daily.period
+    if h.daily.inputs != h.periods % h.daily.period or h.weekly.inputs != day % h.weekly.period:
+        failures.append(f"day/week boundaries out of line: daily inputs {h.daily.inputs}, weekly {h.weekly.inputs}")
+    for age in range(min(h.daily.capacity, config.NUM_BOXES) + 1):
+        want = expected.day(day - age) if day >= age else (0, 0, 0)
+        if h.daily.entry(age) != want:
+            failures.append(f"day entry {age} days ago is {h.daily.entry(age)}, expected {want}")
+    for age in range(min(h.daily.capacity, config.NUM_BOXES) + 1):
+        low, _, high = expected.day(day - age) if day >= age else (0, 0, 0)
+        # the sketch's bins are 1% wide while the day's range fits in them, and a range of 16 bins needs
+        # at most width 4 (after doubling from the first sample at either end), so half of that is
+        # within a bin of anywhere in the range
+        tolerance = 0 if high - low < BINS // 2 else max(1, (high - low) // 4)
+        for q, got in zip((0.25, 0.5, 0.75), h.day_quartiles(age)):
+            want = expected.quantile(day - age, q) if day >= age else 0
+            if abs(got - want) > tolerance:
+                failures.append(f"day {age} days ago has {q} quantile {got}, expected {want} (range {low}-{high})")
+    week = day // 7
+    # the weekly tier starts where the daily one ends
+    past = h.daily.capacity // 7
+    for age in range(1, min(h.weekly.capacity, 4) + 1):
+        want = expected.week(week - past - age) if week >= past + age else (0, 0, 0)
+        if h.weekly.entry(age) != want:
+            failures.append(f"week entry {age} weeks ago is {h.weekly.entry(age)}, expected {want}")
+    trend = state.trend
+    for (name, _), want in zip(trend.FIELDS, expected.trend(trend.decay)):
+        got = getattr(trend, name)
+        if abs(got - want) > 1e-3 * max(1, abs(want)):
+            failures.append(f"trend sum {name} is {got}, expected {want}")
+    if state.run_cycles != display_wakes % 65536:
+        failures.append(f"run_cycles is {state.run_cycles} after {display_wakes} display wakes")
+    top = graph_layout.graph_y0 - graph_layout.graph_height
+    if config.DENSE_GRAPH:
+        failures.extend(check_dense(h, top))
+        boxes = ()
+    else:
+        boxes = graph_layout.layout_data(h)[0]
+    last_x = 0
+    for x, min_y, max_y, q1_y, median_y, q3_y in boxes:
+        # pixel y grows downward, so the max is drawn above the upper quartile, and so on down to the min
+        if x <= last_x or not top <= max_y <= q3_y <= median_y <= q1_y <= min_y <= graph_layout.graph_y0:
+            failures.append(f"bad graph box {(x, min_y, max_y, q1_y, median_y, q3_y)}")
+        last_x = x
+    if len(boxes) > config.NUM_BOXES:
+        failures.append(f"{len(boxes)} boxes on the graph")
+    if refreshed:
+        texts = []
+        for kind, attrs in adafruit_il0373.refreshes[-1]:
+            if kind == "TileGrid":
+                texts.append("".join(graph_layout.GLYPHS[tile] for tile in attrs["tiles"]).strip())
+        fine_rh = "--" if fine_rh is None else f"{fine_rh:.1f}"
+        want = (str(h.latest()), f"{h.latest() or '--'}%", f"{fine_rh}%")[state.view]
+        if want not in texts:
+            failures.append(f"screen refreshed without the latest reading {want} in view {state.view}: {texts}")
+    return failures
+
+
+def check_dense(h, top):
+    """Check the dense graph's columns: each inside the graph, and each raw sample in its span of time
+    drawn within the column at its end."""
+    from core import graph_layout
+
+    failures = []
+    columns, highlight, _ = graph_layout.dense_layout(h)
+    for c in range(graph_layout.dense_width):
+        low_y, high_y = columns[2 * c], columns[2 * c + 1]
+        if low_y and not top <= low_y <= high_y <= graph_layout.graph_y0:
+            failures.append(f"bad dense graph column {c}: {low_y}-{high_y}")
+    span = min(graph_layout.dense_hours * 60 // config.SAMPLE_MINUTES, h.raw.capacity)
+    end = span
+    for age in range(min(h.total, h.raw.capacity)):
+        rh = h.raw.data[h.raw.index(age)]
+        c = (end * graph_layout.dense_width - 1) // span
+        y = graph_layout.graph_y0 - graph_layout.scale_and_clip(rh)
+        if rh and not columns[2 * c] <= y <= columns[2 * c + 1]:
+            failures.append(f"sample {age} ago at RH {rh} is outside dense graph column {c}")
+            break
+        end -= h.intervals.data[h.raw.index(age)]
+        if end <= 0:
+            break
+    if h.latest() and highlight[1] != graph_layout.graph_y0 - graph_layout.scale_and_clip(h.latest()):
+        failures.append(f"dense graph highlight {highlight} is not at the latest sample {h.latest()}")
+    return failures
+
+
+def replay(name, trace, days, modules, buttons=0, rng=None):
+    """Run wakes from a first boot until days have been simulated, pressing a button during every
+    buttons-th wake (if not 0), checking after each one. Return the number of failed checks."""
+    alarm.sleep_memory[:] = bytes(len(alarm.sleep_memory))
+    alarm.wake_alarm = None
+    config.LOG_DIR = os.path.join(tempfile.mkdtemp(), "log")
+    config.CHROME_BMP = os.path.join(os.path.dirname(config.LOG_DIR), "chrome.bmp")
+    config.GLYPHS_BMP = os.path.join(os.path.dirname(config.LOG_DIR), "glyphs.bmp")
+    adafruit_il0373.refreshes.clear()
+    minutes = 0
+    last_wake = None
+    last_refresh = None
+    readings = []
+    # one reading per wake, however many measurements the code takes of it (see DISPLAY_SENSOR_READS)
+    adafruit_sht4x.source = lambda: readings[-1] if readings else readings.append(trace(minutes)) or readings[-1]
+    expected = None
+    wakes = 0
+    display_wakes = 0
+    refreshes = 0
+    failures = 0
+    start = time.perf_counter()
+    presses = 0
+    while minutes < days * 24 * 60 and failures < MAX_FAILURES:
+        readings.clear()
+        alarm.light_sleeps.clear()
+        pressed = None
+        if buttons and wakes % buttons == buttons - 1:
+            pressed = rng.randrange(len(config.BUTTON_PINS))
+            alarm.presses[:] = [getattr(board, config.BUTTON_PINS[pressed])]
+        profile = wake(run=modules.run_code)
+        if pressed is not None and not alarm.presses:
+            presses += 1
+        else:
+            pressed = None
+        alarm.presses.clear()
+        after_sleep = time.monotonic()
+        state = sys.modules["wake_state"].state
+        if expected is None:
+            expected = Expected(state.history.daily.period)
+        # the first sample counts as one period, like the history's first sample
+        weight = 1 if last_wake is None else max(1, (minutes - last_wake) // config.SAMPLE_MINUTES)
+        for reading in readings:
+            expected.add(0 if reading is None else min(100, max(0, int(reading + 0.5))), weight)
+        expected.prune(state.history.daily.capacity + 7 * 5)
+        wakes += 1
+        display_wakes += profile.kind
+        refreshed = len(adafruit_il0373.refreshes) > 0
+        refreshes += len(adafruit_il0373.refreshes)
+        if pressed is not None and (state.view != pressed or len(adafruit_il0373.refreshes) < 2):
+            failures += 1
+            print(f"{name}: wake {wakes}: button for view {pressed} pressed, but view {state.view} is showing")
+        # a refresh for a button press waits out the rest of the minimum interval in light sleep
+        if sum(alarm.light_sleeps) < config.MIN_REFRESH_SECONDS * (len(adafruit_il0373.refreshes) - 1):
+            failures += 1
+            print(f"{name}: wake {wakes}: {len(adafruit_il0373.refreshes)} refreshes after {alarm.light_sleeps} s")
+        if refreshed:
+            if last_refresh is not None and 60 * (minutes - last_refresh) < config.MIN_REFRESH_SECONDS:
+                failures += 1
+                print(f"{name}: wake {wakes}: refreshed {minutes - last_refresh} minutes after the last refresh")
+            last_refresh = minutes
+        for failure in check(state, expected, readings[-1], display_wakes, refreshed):
+            failures += 1
+            if failures <= MAX_FAILURES:
+                print(f"{name}: wake {wakes}, day {minutes / (24 * 60):.2f}: {failure}")
+        adafruit_il0373.refreshes.clear()
+        last_wake = minutes
+        minutes += round((alarm.wake_alarm.monotonic_time - after_sleep) / 60)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name}: {wakes} wakes ({display_wakes} display, {refreshes} refreshes, {presses} buttons) over {minutes / (24 * 60):.0f} days "
+        f"in {elapsed:.1f} s, {wakes / elapsed:.0f} wakes/s, {failures} failed checks"
+    )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("scenarios", nargs="+", help=f"{', '.join(SCENARIOS)} or a CSV trace file")
+    parser.add_argument("--days", type=float, default=365, help="days to simulate (default 365)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the scenarios")
+    parser.add_argument("--dense", action="store_true", help="with the dense graph (see DENSE_GRAPH in config.py)")
+    parser.add_argument("--buttons", type=int, default=0, metavar="N", help="press a view button every Nth wake")
+    args = parser.parse_args()
+    config.DENSE_GRAPH = args.dense
+
+    modules = CompiledModules()
+    sys.meta_path.insert(0, modules)
+    time.sleep = lambda seconds: None
+    failures = 0
+    for name in args.scenarios:
+        if name in SCENARIOS:
+            trace = SCENARIOS[name](random.Random(args.seed))
+        else:
+            trace = csv_trace(name)
+        failures += replay(name, trace, args.days, modules, args.buttons, random.Random(args.seed))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
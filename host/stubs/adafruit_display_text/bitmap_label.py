@@ -0,0 +1,25 @@
+"""Host stand-in for adafruit_display_text.bitmap_label: each character is drawn as a 6x12 box outline."""
+
+from displayio import Bitmap
+
+GLYPH_WIDTH = 6
+GLYPH_HEIGHT = 12
+
+
+class Label:
+    def __init__(self, font, x=0, y=0, text="", color=None, background_color=None, **padding):
+        self.x = x
+        self.y = y
+        self.text = text
+        self.color = color
+        self.background_color = background_color
+        self.bitmap = Bitmap(max(1, GLYPH_WIDTH * len(text)), GLYPH_HEIGHT, 2)
+        for n in range(len(text)):
+            for i in range(GLYPH_WIDTH - 1):
+                self.bitmap[n * GLYPH_WIDTH + i, 0] = 1
+                self.bitmap[n * GLYPH_WIDTH + i, GLYPH_HEIGHT - 1] = 1
+            for j in range(GLYPH_HEIGHT):
+                self.bitmap[n * GLYPH_WIDTH, j] = 1
+                self.bitmap[n * GLYPH_WIDTH + GLYPH_WIDTH - 2, j] = 1
+        # (x, y, width, height) relative to the label's origin, which is at the middle of the left edge
+        self.bounding_box = (0, -GLYPH_HEIGHT // 2, self.bitmap.width, GLYPH_HEIGHT)
@@ -0,0 +1,10 @@
+"""Host stand-in for adafruit_display_text.label."""
+
+
+class Label:
+    def __init__(self, font, x=0, y=0, text="", color=None, background_color=None, **padding):
+        self.x = x
+        self.y = y
+        self.text = text
+        self.color = color
+        self.background_color = background_color
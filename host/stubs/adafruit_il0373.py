@@ -0,0 +1,28 @@
+"""Host stand-in for the IL0373 E Ink driver: records each refresh instead of drawing it."""
+
+# every refresh of any display, as a flattened list of what was on screen (see snapshot())
+refreshes = []
+
+
+def snapshot(group):
+    """Flatten a display group into a list of (type name, attributes) for each shape and label."""
+    items = []
+    for child in group:
+        if isinstance(child, list):
+            items.extend(snapshot(child))
+        else:
+            # copy any lists (such as a TileGrid's tiles), which go on changing after the refresh
+            attrs = {name: value[:] if isinstance(value, list) else value for name, value in vars(child).items()}
+            items.append((type(child).__name__, attrs))
+    return items
+
+
+class IL0373:
+    def __init__(self, display_bus, width, height, rotation=0, busy_pin=None, highlight_color=None):
+        self.width = width
+        self.height = height
+        self.root_group = None
+        self.time_to_refresh = 0
+
+    def refresh(self):
+        refreshes.append(snapshot(self.root_group or []))
@@ -0,0 +1,40 @@
+"""Host stand-in for the SHT4x driver, returning scripted readings."""
+
+# readings still to come, taken in order; once they run out, readings come from source() if set,
+# otherwise the sensor holds at DEFAULT_RH. A reading of None fails like a disconnected sensor.
+script = []
+source = None
+DEFAULT_RH = 15.0
+
+
+class Mode:
+    NOHEAT_HIGHPRECISION = 0xFD
+    NOHEAT_MEDPRECISION = 0xF6
+    NOHEAT_LOWPRECISION = 0xE0
+
+
+class SHT4x:
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.mode = Mode.NOHEAT_HIGHPRECISION
+
+    @property
+    def measurements(self):
+        """(temperature, RH) from a single measurement."""
+        return self.temperature, self.relative_humidity
+
+    @property
+    def relative_humidity(self):
+        if script:
+            rh = script.pop(0)
+        elif source:
+            rh = source()
+        else:
+            rh = DEFAULT_RH
+        if rh is None:
+            raise OSError(19, "No such device")
+        return rh
+
+    @property
+    def temperature(self):
+        return 20.0
@@ -0,0 +1,64 @@
+"""
+Host stand-in for CircuitPython's alarm module.
+
+sleep_memory is a plain bytearray that outlives each simulated wake, and deep sleep raises
+DeepSleep instead of powering down: the harness (see host/bench.py) catches it, sets
+wake_alarm and runs code.py again, as the board would on waking.
+"""
+
+import time as _time
+import types
+
+sleep_memory = bytearray(8192)  # same size as the SAMD51 backup RAM
+wake_alarm = None
+# pins a PinAlarm can wake from deep sleep on; on the SAMD51 only a few, and none of the Featherwing
+# buttons, which is only found out when going into deep sleep
+deep_sleep_pins = ()
+# pins to press, one during each light sleep that waits on a PinAlarm for it (see host/replay.py),
+# and how long each light sleep was set for, in seconds
+presses = []
+light_sleeps = []
+
+
+class DeepSleep(Exception):
+    """Raised by exit_and_deep_sleep_until_alarms(), carrying the alarms to wake on."""
+
+    def __init__(self, alarms):
+        super().__init__(alarms)
+        self.alarms = alarms
+
+
+class TimeAlarm:
+    def __init__(self, monotonic_time=None, epoch_time=None):
+        self.monotonic_time = monotonic_time
+        self.epoch_time = epoch_time
+
+
+class PinAlarm:
+    def __init__(self, pin, value, edge=False, pull=False):
+        self.pin = pin
+        self.value = value
+        self.edge = edge
+        self.pull = pull
+
+
+time = types.SimpleNamespace(TimeAlarm=TimeAlarm)
+pin = types.SimpleNamespace(PinAlarm=PinAlarm)
+
+
+def light_sleep_until_alarms(*alarms):
+    for a in alarms:
+        if isinstance(a, PinAlarm) and presses and a.pin == presses[0]:
+            presses.pop(0)
+            return a
+    for a in alarms:
+        if isinstance(a, TimeAlarm):
+            light_sleeps.append(a.monotonic_time - _time.monotonic())
+            return a
+
+
+def exit_and_deep_sleep_until_alarms(*alarms):
+    for a in alarms:
+        if isinstance(a, PinAlarm) and a.pin not in deep_sleep_pins:
+            raise ValueError(f"{a.pin} can't wake from deep sleep")
+    raise DeepSleep(alarms)
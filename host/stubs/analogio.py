@@ -0,0 +1,16 @@
+"""Host stand-in for CircuitPython's analogio module."""
+
+# raw reading for the battery monitor (16 bits, behind the Feather's divider), about 4.0 V
+VBAT_VALUE = 39700
+
+
+class AnalogIn:
+    def __init__(self, pin):
+        self.pin = pin
+
+    @property
+    def value(self):
+        return VBAT_VALUE
+
+    def deinit(self):
+        pass
@@ -0,0 +1,31 @@
+"""Host stand-in for CircuitPython's bitmaptools module (the drawing functions used here)."""
+
+
+def draw_line(dest_bitmap, x1, y1, x2, y2, value):
+    """Bresenham line, both ends included."""
+    dx = abs(x2 - x1)
+    dy = -abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx + dy
+    while True:
+        dest_bitmap[x1, y1] = value
+        if x1 == x2 and y1 == y2:
+            return
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x1 += sx
+        if e2 <= dx:
+            err += dx
+            y1 += sy
+
+
+def fill_region(dest_bitmap, x1, y1, x2, y2, value):
+    """Fill the rectangle from (x1, y1) up to but not including (x2, y2), clipped to the bitmap as on
+    the device."""
+    x1, x2 = max(0, min(x1, x2)), min(dest_bitmap.width, max(x1, x2))
+    y1, y2 = max(0, min(y1, y2)), min(dest_bitmap.height, max(y1, y2))
+    for y in range(y1, y2):
+        for x in range(x1, x2):
+            dest_bitmap[x, y] = value
@@ -0,0 +1,16 @@
+"""Host stand-in for CircuitPython's board module: pins are just names."""
+
+D9 = "D9"
+D10 = "D10"
+D11 = "D11"
+D12 = "D12"
+D13 = "D13"
+VOLTAGE_MONITOR = "VOLTAGE_MONITOR"
+
+
+def I2C():
+    return None
+
+
+def SPI():
+    return None
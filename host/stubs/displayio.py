@@ -0,0 +1,96 @@
+"""Host stand-in for CircuitPython's displayio module: groups are plain lists of their children."""
+
+import struct
+
+
+def release_displays():
+    pass
+
+
+class Group(list):
+    def __init__(self, scale=1, x=0, y=0):
+        super().__init__()
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+
+class Bitmap:
+    """Pixels are kept one byte each, so what was drawn can be checked."""
+
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self.pixels = bytearray(width * height)
+
+    def __getitem__(self, xy):
+        x, y = xy
+        return self.pixels[y * self.width + x]
+
+    def __setitem__(self, xy, value):
+        x, y = xy
+        if not (0 <= x < self.width and 0 <= y < self.height and 0 <= value < self.value_count):
+            raise ValueError(f"pixel {xy} = {value} out of range")
+        self.pixels[y * self.width + x] = value
+
+    def fill(self, value):
+        self.pixels[:] = bytes([value]) * len(self.pixels)
+
+
+class Palette(list):
+    def __init__(self, color_count):
+        super().__init__([0] * color_count)
+        self.transparent = set()
+
+    def make_transparent(self, index):
+        self.transparent.add(index)
+
+
+class OnDiskBitmap(Bitmap):
+    """Read the whole of a 1-bit BMP file into memory (the device reads it from flash as needed)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = struct.unpack_from("<I", data, 10)[0]
+        width, height, _, bits = struct.unpack_from("<iiHH", data, 18)
+        colors = struct.unpack_from("<I", data, 46)[0] or 2
+        if bits != 1:
+            raise ValueError(f"{path}: {bits} bits per pixel not supported here")
+        super().__init__(width, height, colors)
+        self.pixel_shader = Palette(colors)
+        for i in range(colors):
+            self.pixel_shader[i] = struct.unpack_from("<I", data, 54 + 4 * i)[0]
+        row_size = (width + 31) // 32 * 4
+        for y in range(height):
+            row = offset + (height - 1 - y) * row_size
+            pixels = b"".join(UNPACKED[byte] for byte in data[row : row + row_size])
+            self.pixels[y * width : (y + 1) * width] = pixels[:width]
+
+
+# each byte of a 1-bit row, as its 8 pixels
+UNPACKED = [bytes((byte >> (7 - i)) & 1 for i in range(8)) for byte in range(256)]
+
+
+class TileGrid:
+    def __init__(self, bitmap, pixel_shader=None, width=1, height=1, tile_width=None, tile_height=None, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.tiles = [0] * (width * height)
+
+    def __getitem__(self, index):
+        return self.tiles[index]
+
+    def __setitem__(self, index, tile):
+        if not 0 <= tile < (self.bitmap.width // self.tile_width) * (self.bitmap.height // self.tile_height):
+            raise ValueError(f"tile {tile} out of range")
+        self.tiles[index] = tile
@@ -0,0 +1,6 @@
+"""Host stand-in for CircuitPython's fourwire module."""
+
+
+class FourWire:
+    def __init__(self, spi, command=None, chip_select=None, reset=None, baudrate=None):
+        self.spi = spi
@@ -0,0 +1,5 @@
+"""Host stand-in for CircuitPython's supervisor module."""
+
+import types
+
+runtime = types.SimpleNamespace(serial_connected=False)
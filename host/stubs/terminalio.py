@@ -0,0 +1,9 @@
+"""Host stand-in for CircuitPython's terminalio module."""
+
+
+class BuiltinFont:
+    def get_bounding_box(self):
+        return 6, 12
+
+
+FONT = BuiltinFont()
@@ -0,0 +1,21 @@
+"""
+Sample-only wake: log a humidity reading and go straight back to deep sleep.
+
+code.py imports this instead of main_humidity_eink.py when the screen is not due for an
+update, so these wakes never pay for initializing the display. The exception is a sudden
+change in RH (see RH_EVENT in config.py), which hands over to the display wake path right away.
+"""
+
+from config import SAMPLE_SENSOR_MODE, SAMPLE_SENSOR_READS
+from sensor import read_climate, read_vbat
+from core.wake_profile import profile
+from wake_state import state, sleep
+
+current_rh, celsius = read_climate(SAMPLE_SENSOR_MODE, SAMPLE_SENSOR_READS, state.history.total)
+state.add_sample(current_rh, celsius, read_vbat())
+profile.mark("sensor")
+if state.event:
+    import main_humidity_eink
+state.flush_log()
+profile.mark("log")
+sleep()
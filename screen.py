@@ -0,0 +1,338 @@
+"""
+E Ink display setup and the layout of everything drawn on it.
+
+Importing this initializes the display, which is slow, so the display wake path only imports
+it once it knows the screen actually needs to be refreshed.
+
+The screen is built in layers. At the bottom is the static chart chrome (axes, ticks and
+their labels), which is drawn into a bitmap only when the layout changes, and otherwise loaded
+from a BMP cached on flash. Above it, the graph data is plotted straight into one bitmap with
+bitmaptools, rather than built from a shape object per line and marker, each of which would
+have its own bitmap for the compositor to walk. The numbers that change are TileGrids over a
+sprite sheet of font glyphs, also cached on flash, so setting them is just setting tile indices
+rather than laying out text, and adafruit_display_text is only imported to redraw a cache.
+"""
+
+import time
+import board
+import displayio
+import fourwire
+import adafruit_il0373
+import bitmaptools
+import terminalio
+from config import CHROME_BMP, GLYPHS_BMP, PROFILE_ON_SCREEN, DESICCANT_RH, DESICCANT_ALERT_DAYS, DENSE_GRAPH
+from core.bmp import write_bmp, bmp_tag
+from core.graph_layout import DISPLAY_WIDTH, DISPLAY_HEIGHT, graph_x0, graph_y0, graph_width, graph_height
+from core.graph_layout import yticks, py_tick, tick_halfwidth, box_halfwidth, highlight_marker_size
+from core.graph_layout import runtime_x, runtime_y, forecast_x, forecast_y, chrome_hash, glyphs_hash, GLYPHS
+from core.graph_layout import dense_x0, dense_width, dense_hours, dense_tick_hours
+
+# color and font constants
+BLACK = 0x000000
+WHITE = 0xFFFFFF
+RED = 0xFF0000
+FONT = terminalio.FONT
+# ...and the palette index of each color in the canvas
+WHITE_INDEX = 0
+BLACK_INDEX = 1
+RED_INDEX = 2
+# size of each glyph in the sprite sheet, and the scale and padding of the current RH readout
+TILE_WIDTH, TILE_HEIGHT = FONT.get_bounding_box()[:2]
+READOUT_X = DISPLAY_WIDTH - 70
+READOUT_SCALE = 3
+READOUT_PADDING = 3
+
+### Display initialization
+
+# Used to ensure the display is free in CircuitPython
+displayio.release_displays()
+
+# Define the pins needed for display use, create displayio connection
+spi = board.SPI()
+epd_cs = board.D9
+epd_dc = board.D10
+epd_reset = None
+epd_busy = None
+display_bus = fourwire.FourWire(spi, command=epd_dc, chip_select=epd_cs, reset=epd_reset, baudrate=1000000)
+time.sleep(1)  # Wait a bit
+
+# Create the display object
+display = adafruit_il0373.IL0373(
+    display_bus,
+    width=DISPLAY_WIDTH,
+    height=DISPLAY_HEIGHT,
+    rotation=270,
+    busy_pin=epd_busy,
+    highlight_color=RED,
+)
+
+#############################
+### Lay out display content
+
+
+def draw_text(bitmap, text, x, y, scale=1):
+    """Draw text into a 2-color bitmap, placed as a Label at (x, y) in a group of the given scale would be."""
+    from adafruit_display_text import bitmap_label
+
+    glyphs = bitmap_label.Label(FONT, text=text, color=BLACK)
+    gx, gy = glyphs.bounding_box[:2]
+    source = glyphs.bitmap
+    for j in range(source.height):
+        for i in range(source.width):
+            if source[i, j]:
+                px = x + scale * (gx + i)
+                py = y + scale * (gy + j)
+                bitmaptools.fill_region(bitmap, px, py, px + scale, py + scale, 1)
+
+
+def draw_chrome():
+    """Draw the static chart chrome (axes, ticks and labels) into a new 2-color bitmap."""
+    chrome = displayio.Bitmap(DISPLAY_WIDTH, DISPLAY_HEIGHT, 2)
+    x1 = dense_x0 + dense_width - 1 if DENSE_GRAPH else graph_x0 + graph_width
+    bitmaptools.draw_line(chrome, graph_x0, graph_y0, x1, graph_y0, 1)
+    bitmaptools.draw_line(chrome, graph_x0, graph_y0, graph_x0, graph_y0 - graph_height, 1)
+    for i in range(yticks + 1):
+        y = graph_y0 - i * py_tick
+        bitmaptools.draw_line(chrome, graph_x0 - tick_halfwidth, y, graph_x0 + tick_halfwidth, y, 1)
+        if (i % 2) == 1:
+            draw_text(chrome, str(i * 10), graph_x0 - 18, y)
+    yaxis_y = graph_y0 - (graph_height // 2) - 10
+    draw_text(chrome, "RH", 6, yaxis_y, scale=2)
+    draw_text(chrome, "%", 6 + 2 * 3, yaxis_y + 2 * 11, scale=2)
+    if DENSE_GRAPH:
+        # ticks above the x axis (below, they would run into the label), every dense_tick_hours back
+        # from the latest sample at the right
+        for hours in range(dense_tick_hours, dense_hours, dense_tick_hours):
+            x = x1 - hours * dense_width // dense_hours
+            bitmaptools.draw_line(chrome, x, graph_y0 - tick_halfwidth, x, graph_y0, 1)
+        text = f"last {dense_hours} hours"
+        draw_text(chrome, text, dense_x0 + (dense_width - TILE_WIDTH * len(text)) // 2, DISPLAY_HEIGHT - 10)
+    else:
+        draw_text(chrome, "days", graph_x0 + graph_width // 2 - 12, DISPLAY_HEIGHT - 10)
+    return chrome
+
+
+def draw_glyphs():
+    """Draw a sprite sheet of GLYPHS, one tile each, into a new 2-color bitmap."""
+    sheet = displayio.Bitmap(TILE_WIDTH * len(GLYPHS), TILE_HEIGHT, 2)
+    for i in range(1, len(GLYPHS)):
+        draw_text(sheet, GLYPHS[i], i * TILE_WIDTH, TILE_HEIGHT // 2)
+    return sheet
+
+
+def cached_bitmap(path, tag, draw, what):
+    """Load a 2-color bitmap from a BMP on flash if its tag matches, or draw it and save it there.
+    Return the bitmap and a black on white palette for it."""
+    if bmp_tag(path) == tag:
+        bitmap = displayio.OnDiskBitmap(path)
+        return bitmap, bitmap.pixel_shader
+    print(f"drawing {what}")
+    bitmap = draw()
+    bitmap_palette = displayio.Palette(2)
+    bitmap_palette[0] = WHITE
+    bitmap_palette[1] = BLACK
+    try:
+        write_bmp(path, bitmap, (WHITE, BLACK), tag)
+    except OSError as e:
+        # most likely the filesystem is not writable (see boot.py): draw it again next time
+        print(f"could not cache {what} on flash: {e}")
+    return bitmap, bitmap_palette
+
+
+def text_grid(width, color, x, y):
+    """A row of width glyph tiles in color, on a transparent background, with its top left at (x, y)."""
+    text_palette = displayio.Palette(2)
+    text_palette[1] = color
+    text_palette.make_transparent(0)
+    return displayio.TileGrid(
+        glyphs,
+        pixel_shader=text_palette,
+        width=width,
+        height=1,
+        tile_width=TILE_WIDTH,
+        tile_height=TILE_HEIGHT,
+        x=x,
+        y=y,
+    )
+
+
+def set_text(grid, text):
+    """Show text in a TileGrid from text_grid(), left aligned, cut off at the grid's width."""
+    for i in range(grid.width):
+        grid[i] = GLYPHS.find(text[i]) if i < len(text) else 0
+
+
+# glyphs for the text in every view, from flash unless the font has changed since they were cached
+glyphs = cached_bitmap(GLYPHS_BMP, glyphs_hash(TILE_WIDTH, TILE_HEIGHT), draw_glyphs, "glyphs")[0]
+
+
+def draw_dot(bitmap, x, y, r, color):
+    """Draw a filled circle into a bitmap, as one horizontal line per row."""
+    for dy in range(-r, r + 1):
+        dx = int((r * r - dy * dy) ** 0.5 + 0.5)
+        bitmaptools.draw_line(bitmap, x - dx, y + dy, x + dx, y + dy, color)
+
+
+class View:
+    """A screen layout, whose group is built the first time it is shown in a wake, and kept so that
+    switching back to it only means updating its values."""
+
+    def __init__(self):
+        self.group = None
+
+    def show(self, data):
+        """Update the view with data from core.views.view_data(), and put it on the display."""
+        if self.group is None:
+            self.group = displayio.Group()
+            self.build(self.group)
+        self.update(data)
+        display.root_group = self.group
+
+
+class GraphView(View):
+    """Daily box and whisker graph (or the dense graph of raw samples, see DENSE_GRAPH in config.py), with
+    the current RH, battery days left and desiccant forecast."""
+
+    def build(self, group):
+        # static chart chrome, from flash unless the layout has changed since it was cached
+        chrome, chrome_palette = cached_bitmap(CHROME_BMP, chrome_hash(), draw_chrome, "chart chrome")
+        group.append(displayio.TileGrid(chrome, pixel_shader=chrome_palette, x=0, y=0))
+        # graph data, drawn into a transparent layer over the chrome (see update())
+        self.canvas = displayio.Bitmap(DISPLAY_WIDTH, DISPLAY_HEIGHT, 3)
+        palette = displayio.Palette(3)
+        palette[WHITE_INDEX] = WHITE
+        palette[BLACK_INDEX] = BLACK
+        palette[RED_INDEX] = RED
+        palette.make_transparent(WHITE_INDEX)
+        group.append(displayio.TileGrid(self.canvas, pixel_shader=palette, x=0, y=0))
+        # estimated battery days left, in corner (runtime_y is the middle of the text, as for a Label)
+        self.runtime_text = text_grid(6, BLACK, runtime_x, runtime_y - TILE_HEIGHT // 2)
+        group.append(self.runtime_text)
+        # desiccant forecast, in black, or in white on a red badge drawn into the canvas
+        self.forecast_text = text_grid(8, BLACK, forecast_x, forecast_y - TILE_HEIGHT // 2)
+        group.append(self.forecast_text)
+        if PROFILE_ON_SCREEN:
+            group.append(profile_text)
+        # current RH, in white on a red box drawn into the canvas
+        self.current_rh_text = displayio.Group(scale=READOUT_SCALE, x=READOUT_X, y=graph_y0)
+        self.current_rh_text.append(text_grid(3, WHITE, 0, 0))
+        group.append(self.current_rh_text)
+
+    def update(self, data):
+        """Draw the graph data into the canvas, with positions from layout_data() or dense_layout()."""
+        canvas = self.canvas
+        canvas.fill(WHITE_INDEX)
+        if DENSE_GRAPH:
+            self.draw_columns(data["columns"])
+        else:
+            self.draw_boxes(data["boxes"])
+        # most recent data
+        highlight = data["highlight"]
+        draw_dot(canvas, highlight[0], highlight[1], highlight_marker_size, RED_INDEX)
+        # update current RH values, with readout_y the middle of the readout
+        text = f"{data['rh']}"
+        readout = self.current_rh_text
+        set_text(readout[0], text)
+        readout.y = data["readout_y"] - READOUT_SCALE * TILE_HEIGHT // 2
+        pad = READOUT_SCALE * READOUT_PADDING
+        x1 = min(DISPLAY_WIDTH, READOUT_X + READOUT_SCALE * TILE_WIDTH * len(text) + pad)
+        y0 = max(0, readout.y - READOUT_SCALE)
+        y1 = min(DISPLAY_HEIGHT, readout.y + READOUT_SCALE * (TILE_HEIGHT + 1))
+        bitmaptools.fill_region(canvas, READOUT_X - pad, y0, x1, y1, RED_INDEX)
+        set_text(self.runtime_text, f"~{data['days_left']}d")
+        # days until the desiccant is used up (the trend reaches DESICCANT_RH), if RH is rising
+        desiccant_days = data["desiccant_days"]
+        text = "" if desiccant_days is None else f"{DESICCANT_RH}%~{desiccant_days}d"
+        forecast = self.forecast_text
+        set_text(forecast, text)
+        alert = desiccant_days is not None and desiccant_days <= DESICCANT_ALERT_DAYS
+        forecast.pixel_shader[1] = WHITE if alert else BLACK
+        if alert:
+            x1 = forecast_x + TILE_WIDTH * len(text) + 2
+            y1 = forecast.y + TILE_HEIGHT + 1
+            bitmaptools.fill_region(canvas, forecast_x - 3, forecast.y - 2, x1, y1, RED_INDEX)
+
+    def draw_boxes(self, boxes):
+        """For each day, draw a box from the lower to the upper quartile, across which is a line at the
+        median, with whiskers out to the min and max."""
+        canvas = self.canvas
+        for x, dmin_y, dmax_y, q1_y, median_y, q3_y in boxes:
+            left = x - box_halfwidth
+            right = x + box_halfwidth
+            bitmaptools.draw_line(canvas, x, dmin_y, x, q1_y, BLACK_INDEX)
+            bitmaptools.draw_line(canvas, x, q3_y, x, dmax_y, BLACK_INDEX)
+            bitmaptools.draw_line(canvas, left, q1_y, left, q3_y, BLACK_INDEX)
+            bitmaptools.draw_line(canvas, right, q1_y, right, q3_y, BLACK_INDEX)
+            bitmaptools.draw_line(canvas, left, q1_y, right, q1_y, BLACK_INDEX)
+            bitmaptools.draw_line(canvas, left, q3_y, right, q3_y, BLACK_INDEX)
+            bitmaptools.draw_line(canvas, left - 1, median_y, right + 1, median_y, BLACK_INDEX)
+
+    def draw_columns(self, columns):
+        """Draw each pixel column of the dense graph as one vertical line, from its max down to its min."""
+        canvas = self.canvas
+        x = dense_x0
+        for c in range(0, len(columns), 2):
+            if columns[c]:
+                bitmaptools.draw_line(canvas, x, columns[c], x, columns[c + 1], BLACK_INDEX)
+            x += 1
+
+
+class NumberView(View):
+    """The current RH, as big as it fits, for reading across a room."""
+
+    SCALE = 8
+
+    def build(self, group):
+        width = 4 * TILE_WIDTH * self.SCALE
+        height = TILE_HEIGHT * self.SCALE
+        self.text = displayio.Group(
+            scale=self.SCALE, x=(DISPLAY_WIDTH - width) // 2, y=(DISPLAY_HEIGHT - height) // 2
+        )
+        self.text.append(text_grid(4, BLACK, 0, 0))
+        group.append(self.text)
+
+    def update(self, data):
+        set_text(self.text[0], f"{data['rh']}%" if data["rh"] else "--%")
+
+
+class ClimateView(View):
+    """Temperature, RH and dew point, one to a line."""
+
+    SCALE = 3
+    LINES = 3
+
+    def build(self, group):
+        self.lines = []
+        line_height = DISPLAY_HEIGHT // self.LINES
+        top = (line_height - self.SCALE * TILE_HEIGHT) // 2
+        for i in range(self.LINES):
+            line = displayio.Group(scale=self.SCALE, x=20, y=i * line_height + top)
+            # wide enough for the longest line, a dew point such as "dp -10.3C"
+            line.append(text_grid(9, RED if i == 0 else BLACK, 0, 0))
+            group.append(line)
+            self.lines.append(line)
+
+    def update(self, data):
+        rh, celsius, dew_point = data["climate"]
+        texts = (
+            "--C" if celsius is None else f"{celsius:.1f}C",
+            "--%" if rh is None else f"{rh:.1f}%",
+            "dp --C" if dew_point is None else f"dp {dew_point:.1f}C",
+        )
+        for line, text in zip(self.lines, texts):
+            set_text(line[0], text)
+
+
+# debug corner, for a summary of the previous wake's profile (any text, so this one is a Label)
+if PROFILE_ON_SCREEN:
+    from adafruit_display_text import label
+
+    profile_text = displayio.Group(scale=1, x=DISPLAY_WIDTH - 76, y=6)
+    profile_text.append(label.Label(FONT, text="", color=BLACK))
+
+# in the order of the view numbers in core/views.py
+VIEWS = (GraphView(), NumberView(), ClimateView())
+
+
+def show(view, data):
+    VIEWS[view].show(data)
@@ -0,0 +1,127 @@
+"""
+Humidity sensor access, shared by the sample-only and display wake paths.
+
+Readings come from the source chosen by SENSOR in config.py: one of the I2C sensors below, or a
+hardware-free source from core/sensor_sources.py, in which case I2C is never touched.
+"""
+
+import time
+import analogio
+import board
+from config import SENSOR, SENSOR_REPLAY_FILE, SAMPLE_MINUTES
+from core.sensor_sources import SensorSource, MissingSource, ReplaySource, SyntheticSource
+
+
+class SHT4xSource(SensorSource):
+    def __init__(self):
+        import adafruit_sht4x
+
+        self.sensor = adafruit_sht4x.SHT4x(board.I2C())
+        # precision modes by name (see SAMPLE_SENSOR_MODE in config.py), all without the heater
+        self.modes = {
+            "low": adafruit_sht4x.Mode.NOHEAT_LOWPRECISION,
+            "medium": adafruit_sht4x.Mode.NOHEAT_MEDPRECISION,
+            "high": adafruit_sht4x.Mode.NOHEAT_HIGHPRECISION,
+        }
+
+    def read(self, mode="high"):
+        # one measurement gives both (the relative_humidity and temperature properties would take one each)
+        self.sensor.mode = self.modes[mode]
+        return self.sensor.measurements
+
+
+class AHT20Source(SensorSource):
+    """The previous, lower-accuracy sensor, which has no precision modes."""
+
+    MODES = ("high",)
+
+    def __init__(self):
+        import adafruit_ahtx0
+
+        self.sensor = adafruit_ahtx0.AHTx0(board.I2C())
+
+    def read(self, mode="high"):
+        rh = self.sensor.relative_humidity
+        # the driver keeps the temperature from the same measurement, where its property would take
+        # another, but only in a private attribute, so fall back to the property if it goes away
+        celsius = getattr(self.sensor, "_temp", None)
+        if celsius is None:
+            celsius = self.sensor.temperature
+        return celsius, rh
+
+
+def open_source(kind):
+    """Return the source of readings for SENSOR kind. If it can't be set up (the sensor missing or not
+    responding, its driver or the replay file missing), return a MissingSource instead, so every read
+    fails and is logged as no data, and the board still goes back to sleep to try again next wake."""
+    try:
+        if kind == "sht4x":
+            return SHT4xSource()
+        if kind == "aht20":
+            return AHT20Source()
+        if kind == "replay":
+            return ReplaySource(SENSOR_REPLAY_FILE)
+        if kind == "synthetic":
+            return SyntheticSource(sample_minutes=SAMPLE_MINUTES)
+        raise ValueError(f"unknown sensor {kind}")
+    except (ImportError, OSError, RuntimeError, ValueError) as e:
+        print(f"could not open sensor {kind}: {e}")
+        return MissingSource(e)
+
+
+source = open_source(SENSOR)
+
+# battery voltage, through the Feather's VBAT divider (which halves it)
+vbat_monitor = analogio.AnalogIn(board.VOLTAGE_MONITOR)
+
+
+def read_climate(mode="high", reads=1, sample=0, source=source):
+    """Return the current RH in % and temperature in C, each the median of reads measurements in
+    the given precision mode. sample is the number of samples taken before this one, for sources
+    that play back a sequence. Return (0, None) (no data) if the sensor could not be read at all."""
+    source.seek(sample)
+    temperatures = []
+    rhs = []
+    for _ in range(reads):
+        try:
+            celsius, current_rh = source.read(mode)
+        except (OSError, RuntimeError) as e:
+            print(f"could not read humidity sensor: {e}")
+            continue
+        temperatures.append(celsius)
+        rhs.append(current_rh)
+    if not rhs:
+        return 0, None
+    temperatures.sort()
+    rhs.sort()
+    return rhs[len(rhs) // 2], temperatures[len(temperatures) // 2]
+
+
+def benchmark(n=20):
+    """Measure the time per measurement, and the noise (standard deviation of n back-to-back
+    measurements) of RH and temperature, in each precision mode. Returns {mode: (ms, rh_sd, t_sd)}."""
+    results = {}
+    for mode in source.MODES:
+        temperatures = []
+        rhs = []
+        start = time.monotonic_ns()
+        for _ in range(n):
+            celsius, current_rh = source.read(mode)
+            temperatures.append(celsius)
+            rhs.append(current_rh)
+        ms = (time.monotonic_ns() - start) / n / 1e6
+        rh_sd = standard_deviation(rhs)
+        t_sd = standard_deviation(temperatures)
+        results[mode] = (ms, rh_sd, t_sd)
+        print(f"{mode:<6} {ms:6.2f} ms per measurement, RH noise {rh_sd:.3f}%, T noise {t_sd:.3f}C")
+    return results
+
+
+def standard_deviation(values):
+    mean = sum(values) / len(values)
+    return (sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5
+
+
+def read_vbat():
+    """Return the battery voltage."""
+    return vbat_monitor.value * 2 * 3.3 / 65535
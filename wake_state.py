@@ -0,0 +1,80 @@
+"""
+Everything that must survive deep sleep, loaded from sleep memory as soon as this is imported.
+
+Shared by the sample-only and display wake paths, so it imports nothing display related. The
+logic is in core/state.py; this just connects it to the board's sleep memory and alarms.
+"""
+
+import time
+import alarm
+import board
+from config import DEBUG_MODE, BUTTON_PINS
+from core.state import WakeState
+from core.wake_profile import profile
+
+
+def light_sleep(seconds):
+    """Wait in light sleep (RAM and the display kept, but the CPU idle) rather than busy waiting."""
+    time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + seconds)
+    alarm.light_sleep_until_alarms(time_alarm)
+
+
+def button_alarms(deep):
+    """Alarms for a press of any of the view buttons (pulled up, so pressed reads low)."""
+    alarms = []
+    for name in BUTTON_PINS:
+        try:
+            alarms.append(alarm.pin.PinAlarm(pin=getattr(board, name), value=False, pull=True))
+        except ValueError:
+            # not every pin can wake the board, particularly from deep sleep
+            print(f"button {name} can't wake from {'deep' if deep else 'light'} sleep")
+    return alarms
+
+
+def button_view(wake_alarm):
+    """The view for the button that raised wake_alarm, or None if it was not a button."""
+    if isinstance(wake_alarm, alarm.pin.PinAlarm):
+        for view, name in enumerate(BUTTON_PINS):
+            if wake_alarm.pin == getattr(board, name):
+                return view
+    return None
+
+
+def wait_for_button(seconds):
+    """Light sleep for up to seconds, or until a view button is pressed, and return its view or None.
+
+    This works on boards whose pins can't wake them from deep sleep, such as the SAMD51's."""
+    time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + seconds)
+    try:
+        return button_view(alarm.light_sleep_until_alarms(time_alarm, *button_alarms(deep=False)))
+    except (ValueError, NotImplementedError) as e:
+        print(f"buttons can't wake from light sleep ({e})")
+        return None
+
+
+def sleep():
+    """Save state to sleep memory and deep sleep until the next sample is due, or a button is pressed."""
+    minutes = state.end_wake()
+    time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + 60 * minutes)
+    try:
+        alarm.exit_and_deep_sleep_until_alarms(time_alarm, *button_alarms(deep=True))
+    except (ValueError, NotImplementedError) as e:
+        # a port may only check which pins can wake it from deep sleep here, when setting the alarms
+        print(f"buttons can't wake from deep sleep ({e}), sleeping until the next sample")
+        alarm.exit_and_deep_sleep_until_alarms(time_alarm)
+    print("ERROR: deep sleep failed, reached unexpected location in code...")
+
+
+# Initialize data depending on bootup vs. waking from deep sleep
+# (saved state is also picked up after a reset, as long as sleep memory still holds a valid copy)
+profile.mark("import")
+state = WakeState(alarm.sleep_memory)
+if alarm.wake_alarm:
+    print("waking after deep sleep, loading variables from sleep memory")
+if not state.load():
+    state.init_first_boot()
+elif button_view(alarm.wake_alarm) is not None:
+    state.button_pressed(button_view(alarm.wake_alarm))
+profile.mark("load")
+if DEBUG_MODE:
+    print("DEBUG MODE ON -- randomized data generation")